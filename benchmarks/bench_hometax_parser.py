@@ -0,0 +1,74 @@
+# 표준 라이브러리
+import re
+import timeit
+import argparse
+# 3rd party
+# 내부 패키지
+from hometax import parse_status, parse_status_stream
+
+# 홈택스 응답 파서 벤치마크. 기존 정규표현식 추출과 선형 탐색(parse_status), XML pull 파서(parse_status_stream)의
+# 응답 크기별 소요 시간을 비교
+# > python -m benchmarks.bench_hometax_parser --sizes 1000,10000,100000 --number 20
+
+# 기존 extract_status 의 정규표현식 (비교 기준)
+LEGACY_PATTERN = re.compile(pattern='<smpcBmanTrtCntn>(?P<status>[^<]+).+<trtCntn>(?P<desc>[^<]+)', flags=re.UNICODE)
+
+
+def legacy_extract_status(target_str: str):
+    match_test = LEGACY_PATTERN.search(target_str)
+    if match_test is None:
+        return [None, None]
+    return [match_test.group('status'), match_test.group('desc')]
+
+
+def make_response(filler_count: int, with_desc: bool = True, repeat_status: bool = False):
+    """
+    filler_count 개의 무관한 태그를 가진 한 줄짜리 가짜 홈택스 응답 생성
+
+    Parameters
+    ----------
+    filler_count : int
+        상태 태그와 설명 태그 사이에 넣을 태그 수
+    with_desc : bool
+        설명 태그 포함 여부 (False 면 기존 정규표현식이 응답 끝까지 되짚음)
+    repeat_status : bool
+        상태 태그를 filler 마다 반복할지 여부 (기존 정규표현식의 최악 경우)
+    """
+    status = '<smpcBmanTrtCntn>계속사업자</smpcBmanTrtCntn>'
+    filler = ''.join(('<item{0}>값{0}</item{0}>' + (status if repeat_status else '')).format(index % 10)
+                     for index in range(filler_count))
+    desc = '<trtCntn>부가가치세 일반과세자 입니다.</trtCntn>' if with_desc else ''
+    return "<map id='ATTABZAA001R08'>" + status + filler + desc + '</map>'
+
+
+# (이름, 응답 생성 인자) 비교 대상 응답 형태
+CASES = [
+    ('normal', {}),
+    ('missing_desc', {'with_desc': False}),
+    ('repeated_status', {'with_desc': False, 'repeat_status': True}),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='홈택스 응답 파서 벤치마크')
+    parser.add_argument('--sizes', default='100,1000,10000', help='filler 태그 수 (쉼표 구분)')
+    parser.add_argument('--number', type=int, default=20, help='측정 반복 횟수')
+    args = parser.parse_args()
+
+    print('case              filler     bytes   regex_ms    scan_ms  stream_ms  state')
+    for name, kwargs in CASES:
+        for filler_count in [int(size) for size in args.sizes.split(',')]:
+            response = make_response(filler_count, **kwargs)
+            regex_sec = timeit.timeit(lambda: legacy_extract_status(response), number=args.number)
+            scan_sec = timeit.timeit(lambda: parse_status(response), number=args.number)
+            # 응답을 64KB 조각으로 받는 경우를 흉내
+            chunks = [response[start:start + 65536] for start in range(0, len(response), 65536)]
+            stream_sec = timeit.timeit(lambda: parse_status_stream(chunks), number=args.number)
+            state = parse_status(response).state
+            print('{:<16}  {:>6}  {:>8}  {:>9.3f}  {:>9.3f}  {:>9.3f}  {}'.format(
+                name, filler_count, len(response.encode('utf-8')), regex_sec * 1000 / args.number,
+                scan_sec * 1000 / args.number, stream_sec * 1000 / args.number, state))
+
+
+if __name__ == '__main__':
+    main()
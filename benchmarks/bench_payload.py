@@ -0,0 +1,85 @@
+# 표준 라이브러리
+import os
+import io
+import csv
+import time
+import argparse
+# 3rd party
+# 내부 패키지
+import cloud_vision
+from extractor import extract_bsn
+from utils.utils_img import optimize_for_ocr
+
+# 업로드 최적화 설정별 업로드 바이트 수 대비 사업자 등록 번호 추출 정확도 벤치마크
+# 정답 파일(csv)은 file,bsn 두 컬럼으로 이미지 파일명과 실제 사업자 등록 번호를 담음
+# > python -m benchmarks.bench_payload --img_dir ./data/Bench --answer ./data/Bench/answer.csv --backend vision
+
+# (max_pixels, grayscale, quality) 비교 대상 설정, max_pixels 0 은 원본 그대로
+DEFAULT_PROFILES = [
+    (0, False, 0),
+    (6000000, False, 90),
+    (3000000, True, 80),
+    (2000000, True, 75),
+    (1000000, True, 70),
+    (500000, True, 60),
+]
+
+
+def load_answers(answer_file: str):
+    """
+    정답 csv 를 {파일명: 사업자 등록 번호} 로 적재
+    """
+    with io.open(answer_file, 'r', encoding='utf-8-sig') as f:
+        return {row['file']: row['bsn'] for row in csv.DictReader(f)}
+
+
+def run_profile(engine: cloud_vision.OcrEngine, images: dict, answers: dict, profile: tuple):
+    """
+    설정 하나로 모든 이미지를 최적화/OCR 하여 (업로드 바이트, 정답 수, OCR 소요 시간) 반환
+    """
+    max_pixels, grayscale, quality = profile
+    items = []
+    for img_file, content in images.items():
+        if max_pixels > 0:
+            content = optimize_for_ocr(content, max_pixels, grayscale, quality)
+        items.append((img_file, content))
+
+    start = time.perf_counter()
+    results = engine.detect_batch(items)
+    elapsed = time.perf_counter() - start
+
+    correct = 0
+    for result in results:
+        if result.error is None and extract_bsn(result.text) == answers.get(result.source):
+            correct += 1
+    return sum(len(content) for _, content in items), correct, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='OCR 업로드 최적화 벤치마크')
+    parser.add_argument('--img_dir', required=True, help='벤치마크 이미지 경로')
+    parser.add_argument('--answer', required=True, help='file,bsn 정답 csv')
+    parser.add_argument('--backend', default='vision', help='vision, tesseract, canned')
+    args = parser.parse_args()
+
+    answers = load_answers(args.answer)
+    images = {}
+    for img_file in sorted(answers):
+        with io.open(os.path.join(args.img_dir, img_file), 'rb') as f:
+            images[img_file] = f.read()
+
+    # 설정 간 비교가 캐시에 오염되지 않도록 캐시 없이 엔진 생성
+    with cloud_vision.OcrEngine(cloud_vision.create_backend(args.backend)) as engine:
+        print('max_pixels  gray  quality  upload_bytes  ratio   accuracy  ocr_sec')
+        base_bytes = None
+        for profile in DEFAULT_PROFILES:
+            upload_bytes, correct, elapsed = run_profile(engine, images, answers, profile)
+            if base_bytes is None:
+                base_bytes = upload_bytes
+            print('{:>10}  {:>4}  {:>7}  {:>12}  {:>5.1%}  {:>8.1%}  {:>7.2f}'.format(
+                profile[0] or 'orig', 'Y' if profile[1] else 'N', profile[2] or '-', upload_bytes,
+                upload_bytes / base_bytes, correct / len(images), elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,42 +1,592 @@
 # 표준 라이브러리
 import io
+import time
+import hashlib
+import threading
+from collections import namedtuple
 # 3rd party
 # 내부 패키지
 
+# batch_annotate_images 한 요청에 담을 수 있는 최대 이미지 수
+VISION_MAX_BATCH_IMAGES = 16
+# 요청 JSON 크기 제한(10MB) 대비 base64 인코딩 증가분(4/3)을 감안한 원본 바이트 상한
+VISION_MAX_BATCH_BYTES = 7 * 1024 * 1024
 
-def detect_img_text(path: str):
+# 배치 OCR 의 개별 결과. source 는 호출자가 넘긴 원본 식별자(파일 경로 등), 실패 시 text 는 None
+OcrResult = namedtuple('OcrResult', ['source', 'text', 'error'])
+# 단어 단위 OCR 결과. box 는 이미지 픽셀 좌표 (left, top, right, bottom)
+OcrWord = namedtuple('OcrWord', ['text', 'box'])
+# 단어 위치를 포함한 배치 OCR 의 개별 결과, 실패 시 text/words 는 None
+OcrLayout = namedtuple('OcrLayout', ['source', 'text', 'words', 'error'])
+
+
+class OcrBackend:
     """
-    수령한 이미지를 vision api를 사용해 텍스트로 변환한 후 해당 텍스트 반환
+    OCR 엔진이 사용할 백엔드 인터페이스.
+    이미지 바이트를 받아 텍스트 전문을 돌려주는 detect_text 만 구현하면 OcrEngine 에 끼워 쓸 수 있음
+
+    Attributes
+    ----------
+    name : str
+        백엔드 식별자 (config 의 BACKEND 값과 동일)
+    """
+    name = 'base'
+
+    def detect_text(self, content: bytes):
+        """
+        이미지 바이트에서 텍스트 전문 추출
+
+        Parameters
+        ----------
+        content : bytes
+            인코딩된 이미지 바이트 (jpg, png)
+
+        Returns
+        -------
+        str
+            이미지에서 추출한 full string
+        """
+        raise NotImplementedError
+
+    def settings_key(self):
+        """
+        OCR 결과에 영향을 주는 설정을 문자열로 반환 (OCR 캐시 키에 사용)
+
+        Returns
+        -------
+        str
+            백엔드 설정 문자열
+        """
+        return self.name
+
+    def detect_batch(self, contents: list):
+        """
+        여러 이미지를 한 번에 변환. 기본 구현은 detect_text 를 순서대로 호출하며 이미지별 에러를 분리하여 담음
+
+        Parameters
+        ----------
+        contents : list[bytes]
+            인코딩된 이미지 바이트 리스트
+
+        Returns
+        -------
+        list[tuple[str, Exception]]
+            입력 순서와 같은 (텍스트, 에러) 리스트, 성공 시 에러는 None
+        """
+        results = []
+        for content in contents:
+            try:
+                results.append((self.detect_text(content), None))
+            except Exception as e:
+                results.append((None, e))
+        return results
+
+    def detect_layout(self, content: bytes):
+        """
+        이미지 바이트에서 텍스트 전문과 단어별 위치 추출. 위치를 주지 못하는 백엔드는 단어 리스트가 비어 있음
+
+        Parameters
+        ----------
+        content : bytes
+            인코딩된 이미지 바이트 (jpg, png)
+
+        Returns
+        -------
+        tuple[str, list[OcrWord]]
+            (full string, 단어 리스트)
+        """
+        return self.detect_text(content), []
+
+    def detect_layout_batch(self, contents: list):
+        """
+        여러 이미지의 텍스트와 단어 위치를 한 번에 추출. 기본 구현은 detect_layout 을 순서대로 호출
+
+        Parameters
+        ----------
+        contents : list[bytes]
+            인코딩된 이미지 바이트 리스트
+
+        Returns
+        -------
+        list[tuple[str, list[OcrWord], Exception]]
+            입력 순서와 같은 (텍스트, 단어 리스트, 에러) 리스트, 성공 시 에러는 None
+        """
+        results = []
+        for content in contents:
+            try:
+                results.append(self.detect_layout(content) + (None,))
+            except Exception as e:
+                results.append((None, None, e))
+        return results
+
+    def close(self):
+        """
+        백엔드가 물고 있는 커넥션/리소스 반환
+        """
+        pass
+
+
+class VisionBackend(OcrBackend):
+    """
+    Google Cloud Vision 백엔드.
+    ImageAnnotatorClient 를 한 번만 만들어 gRPC 채널/인증 정보를 run 동안 재사용함
+
+    Attributes
+    ----------
+    client : vision.ImageAnnotatorClient
+        채널을 보유한 Vision 클라이언트
+    """
+    name = 'vision'
+
+    def __init__(self, client=None):
+        from google.cloud import vision
+
+        self._vision = vision
+        self.client = client if client is not None else vision.ImageAnnotatorClient()
+
+    def detect_text(self, content: bytes):
+        image = self._vision.Image(content=content)
+        response = self.client.text_detection(image=image)
+        return parse_text_response(response)
+
+    def _annotate_batch(self, contents: list):
+        # 이미지별 text_detection 요청을 하나의 batch_annotate_images RPC 로 묶어 전송
+        feature = self._vision.Feature(type_=self._vision.Feature.Type.TEXT_DETECTION)
+        requests = [self._vision.AnnotateImageRequest(image=self._vision.Image(content=content), features=[feature])
+                    for content in contents]
+        return self.client.batch_annotate_images(requests=requests).responses
+
+    def detect_batch(self, contents: list):
+        results = []
+        for image_response in self._annotate_batch(contents):
+            try:
+                results.append((parse_text_response(image_response), None))
+            except Exception as e:
+                results.append((None, e))
+        return results
+
+    def detect_layout(self, content: bytes):
+        image = self._vision.Image(content=content)
+        response = self.client.text_detection(image=image)
+        return parse_text_response(response), parse_word_response(response)
+
+    def detect_layout_batch(self, contents: list):
+        results = []
+        for image_response in self._annotate_batch(contents):
+            try:
+                results.append((parse_text_response(image_response), parse_word_response(image_response), None))
+            except Exception as e:
+                results.append((None, None, e))
+        return results
+
+    def close(self):
+        # 클라이언트가 보유한 gRPC 채널 종료
+        transport = getattr(self.client, 'transport', None)
+        if transport is not None and hasattr(transport, 'close'):
+            transport.close()
+
+
+class CannedBackend(OcrBackend):
+    """
+    오프라인 실행/벤치마크용 고정 응답 백엔드. 네트워크 호출 없이 미리 정해둔 텍스트를 반환
+
+    Attributes
+    ----------
+    responses : dict
+        {이미지 바이트의 sha256 hex: 반환할 텍스트}
+    default_text : str
+        responses 에 없는 이미지일 때 반환할 텍스트
+    latency : float
+        호출마다 흉내낼 응답 지연 (초)
+    call_count : int
+        detect_text 호출 횟수 (벤치마크 집계용)
+    """
+    name = 'canned'
+
+    def __init__(self, responses: dict = None, default_text: str = '', latency: float = 0.0):
+        self.responses = responses if responses is not None else {}
+        self.default_text = default_text
+        self.latency = latency
+        self.call_count = 0
+
+    def detect_text(self, content: bytes):
+        self.call_count += 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+        return self.responses.get(hashlib.sha256(content).hexdigest(), self.default_text)
+
+
+class TesseractBackend(OcrBackend):
+    """
+    로컬 tesseract 백엔드. pytesseract 가 설치되어 있을 때만 사용 가능
+
+    Attributes
+    ----------
+    lang : str
+        tesseract 언어 설정 (기본값 kor+eng)
+    """
+    name = 'tesseract'
+
+    def __init__(self, lang: str = 'kor+eng'):
+        import pytesseract
+
+        self._pytesseract = pytesseract
+        self.lang = lang
+
+    def settings_key(self):
+        return self.name + ':' + self.lang
+
+    def detect_text(self, content: bytes):
+        from PIL import Image
+
+        with Image.open(io.BytesIO(content)) as img:
+            return self._pytesseract.image_to_string(img, lang=self.lang)
+
+    def detect_layout(self, content: bytes):
+        from PIL import Image
+
+        with Image.open(io.BytesIO(content)) as img:
+            text = self._pytesseract.image_to_string(img, lang=self.lang)
+            data = self._pytesseract.image_to_data(img, lang=self.lang, output_type=self._pytesseract.Output.DICT)
+        words = [OcrWord(word, (left, top, left + width, top + height))
+                 for word, left, top, width, height in zip(data['text'], data['left'], data['top'],
+                                                           data['width'], data['height'])
+                 if word.strip() != '']
+        return text, words
+
+
+BACKENDS = {
+    VisionBackend.name: VisionBackend,
+    CannedBackend.name: CannedBackend,
+    TesseractBackend.name: TesseractBackend,
+}
+
+
+def create_backend(name: str = 'vision', **kwargs):
+    """
+    이름에 해당하는 OCR 백엔드 객체 생성
 
     Parameters
     ----------
-    path : str
-        이미지 경로명, 파일명
+    name : str
+        vision, canned, tesseract 중 하나
+    kwargs :
+        백엔드 생성자에 그대로 전달할 인자
 
     Returns
     -------
-    str
-        이미지에서 추출한 full string
+    OcrBackend
+        생성된 백엔드 객체
     """
+    if name.lower() not in BACKENDS:
+        raise ValueError('지원하지 않는 OCR 백엔드입니다: {} (사용 가능: {})'.format(name, ', '.join(BACKENDS)))
+    return BACKENDS[name.lower()](**kwargs)
 
-    """Detects text in the file."""
-    from google.cloud import vision
-
-    client = vision.ImageAnnotatorClient()
-
-    with io.open(path, 'rb') as image_file:
-        content = image_file.read()
 
-    image = vision.Image(content=content)
+def parse_text_response(response):
+    """
+    Vision API 응답 객체에서 텍스트 전문 추출, 에러가 담겨 있으면 예외 발생
 
-    response = client.text_detection(image=image)
-    texts = response.text_annotations
+    Parameters
+    ----------
+    response : vision.AnnotateImageResponse
+        text_detection / batch_annotate_images 의 개별 응답
 
+    Returns
+    -------
+    str
+        이미지에서 추출한 full string, 텍스트가 없으면 빈 문자열
+    """
     if response.error.message:
         raise Exception(
             '{}\nFor more info on error messages, check: '
             'https://cloud.google.com/apis/design/errors'.format(
                 response.error.message))
-    else:
-        return_text = texts[0].description
-        return return_text
+    texts = response.text_annotations
+    return texts[0].description if len(texts) > 0 else ''
+
+
+def parse_word_response(response):
+    """
+    Vision API 응답 객체에서 단어별 텍스트와 위치 추출 (text_annotations 의 첫 항목은 전문이므로 제외)
+
+    Parameters
+    ----------
+    response : vision.AnnotateImageResponse
+        text_detection / batch_annotate_images 의 개별 응답
+
+    Returns
+    -------
+    list[OcrWord]
+        단어 리스트, box 는 꼭짓점들을 감싸는 (left, top, right, bottom)
+    """
+    words = []
+    for annotation in response.text_annotations[1:]:
+        xs = [vertex.x for vertex in annotation.bounding_poly.vertices]
+        ys = [vertex.y for vertex in annotation.bounding_poly.vertices]
+        if len(xs) == 0:
+            continue
+        words.append(OcrWord(annotation.description, (min(xs), min(ys), max(xs), max(ys))))
+    return words
+
+
+def plan_batches(sizes: list, max_images: int = VISION_MAX_BATCH_IMAGES, max_bytes: int = VISION_MAX_BATCH_BYTES):
+    """
+    이미지 크기 리스트를 요청당 이미지 수/바이트 상한에 맞게 순서대로 묶음
+
+    Parameters
+    ----------
+    sizes : list[int]
+        이미지별 바이트 크기
+    max_images : int
+        한 요청에 담을 최대 이미지 수
+    max_bytes : int
+        한 요청에 담을 최대 바이트 합계, 단일 이미지가 이를 넘으면 단독 요청으로 보냄
+
+    Returns
+    -------
+    list[list[int]]
+        배치별 입력 index 리스트
+    """
+    batches = []
+    current = []
+    current_bytes = 0
+    for index, size in enumerate(sizes):
+        if current and (len(current) >= max_images or current_bytes + size > max_bytes):
+            batches.append(current)
+            current = []
+            current_bytes = 0
+        current.append(index)
+        current_bytes += size
+    if current:
+        batches.append(current)
+    return batches
+
+
+class OcrEngine:
+    """
+    run 당 한 번 생성하여 재사용하는 OCR 엔진. 백엔드(클라이언트, 채널)를 보유하고 이미지 -> 텍스트 변환을 담당
+
+    Attributes
+    ----------
+    backend : OcrBackend
+        실제 OCR 을 수행할 백엔드
+    cache : utils.utils_cache.OcrCache
+        API 호출 전에 조회할 OCR 결과 캐시, None 이면 캐시 미사용
+    phash_index : utils.utils_phash.PhashIndex
+        캐시에 없을 때 조회할 근사 중복 페이지 인덱스, None 이면 미사용
+    """
+
+    def __init__(self, backend: OcrBackend = None, cache=None, phash_index=None):
+        self.backend = backend if backend is not None else VisionBackend()
+        self.cache = cache
+        self.phash_index = phash_index
+
+    def detect_text(self, content: bytes):
+        """
+        이미지 바이트를 텍스트로 변환
+
+        Parameters
+        ----------
+        content : bytes
+            인코딩된 이미지 바이트
+
+        Returns
+        -------
+        str
+            이미지에서 추출한 full string
+        """
+        text = self.cache.get(content, self.backend.settings_key()) if self.cache is not None else None
+        if text is not None:
+            return text
+        hash_value = None
+        if self.phash_index is not None:
+            hash_value, text = self.phash_index.find(content)
+            if text is not None:
+                return text
+        text = self.backend.detect_text(content)
+        if self.cache is not None:
+            self.cache.put(content, self.backend.settings_key(), text)
+        if hash_value is not None:
+            self.phash_index.add(hash_value, text)
+        return text
+
+    def detect_img_text(self, path: str):
+        """
+        이미지 파일을 읽어 텍스트로 변환
+
+        Parameters
+        ----------
+        path : str
+            이미지 경로명, 파일명
+
+        Returns
+        -------
+        str
+            이미지에서 추출한 full string
+        """
+        with io.open(path, 'rb') as image_file:
+            content = image_file.read()
+        return self.detect_text(content)
+
+    def detect_batch(self, items: list, max_images: int = VISION_MAX_BATCH_IMAGES,
+                     max_bytes: int = VISION_MAX_BATCH_BYTES):
+        """
+        (식별자, 이미지 바이트) 리스트를 배치 요청으로 나누어 변환, 결과는 입력 순서대로 식별자에 매핑됨
+
+        Parameters
+        ----------
+        items : list[tuple[str, bytes]]
+            (원본 식별자, 인코딩된 이미지 바이트) 리스트
+        max_images : int
+            요청당 최대 이미지 수
+        max_bytes : int
+            요청당 최대 바이트 합계
+
+        Returns
+        -------
+        list[OcrResult]
+            입력 순서와 같은 결과 리스트. 배치 요청 자체가 실패하면 해당 배치의 모든 결과에 에러가 담김
+        """
+        results = [None] * len(items)
+        # 캐시에 있거나 이전에 처리한 페이지와 거의 같은 이미지는 요청에서 제외
+        missed = []
+        hashes = {}
+        for index, (source, content) in enumerate(items):
+            text = self.cache.get(content, self.backend.settings_key()) if self.cache is not None else None
+            if text is None and self.phash_index is not None:
+                hashes[index], text = self.phash_index.find(content)
+            if text is None:
+                missed.append(index)
+            else:
+                results[index] = OcrResult(source, text, None)
+        for batch in plan_batches([len(items[index][1]) for index in missed], max_images, max_bytes):
+            batch = [missed[position] for position in batch]
+            try:
+                batch_results = self.backend.detect_batch([items[index][1] for index in batch])
+            except Exception as e:
+                batch_results = [(None, e)] * len(batch)
+            for index, (text, error) in zip(batch, batch_results):
+                results[index] = OcrResult(items[index][0], text, error)
+                if error is None and self.cache is not None:
+                    self.cache.put(items[index][1], self.backend.settings_key(), text)
+                if error is None and index in hashes:
+                    self.phash_index.add(hashes[index], text, items[index][0])
+        return results
+
+    def detect_layout_batch(self, items: list, max_images: int = VISION_MAX_BATCH_IMAGES,
+                            max_bytes: int = VISION_MAX_BATCH_BYTES):
+        """
+        (식별자, 이미지 바이트) 리스트의 텍스트와 단어 위치를 배치 요청으로 추출
+        캐시에 있는 이미지는 요청하지 않으며, 캐시에는 텍스트만 있으므로 이때 결과의 words 는 None
+        백엔드로 얻은 텍스트는 캐시에 저장함
+
+        Parameters
+        ----------
+        items : list[tuple[str, bytes]]
+            (원본 식별자, 인코딩된 이미지 바이트) 리스트
+        max_images : int
+            요청당 최대 이미지 수
+        max_bytes : int
+            요청당 최대 바이트 합계
+
+        Returns
+        -------
+        list[OcrLayout]
+            입력 순서와 같은 결과 리스트
+        """
+        results = [None] * len(items)
+        missed = []
+        for index, (source, content) in enumerate(items):
+            text = self.cache.get(content, self.backend.settings_key()) if self.cache is not None else None
+            if text is None:
+                missed.append(index)
+            else:
+                results[index] = OcrLayout(source, text, None, None)
+        for batch in plan_batches([len(items[index][1]) for index in missed], max_images, max_bytes):
+            batch = [missed[position] for position in batch]
+            try:
+                batch_results = self.backend.detect_layout_batch([items[index][1] for index in batch])
+            except Exception as e:
+                batch_results = [(None, None, e)] * len(batch)
+            for index, (text, words, error) in zip(batch, batch_results):
+                results[index] = OcrLayout(items[index][0], text, words, error)
+                if error is None and self.cache is not None:
+                    self.cache.put(items[index][1], self.backend.settings_key(), text)
+        return results
+
+    def detect_img_batch(self, paths: list, max_images: int = VISION_MAX_BATCH_IMAGES,
+                         max_bytes: int = VISION_MAX_BATCH_BYTES):
+        """
+        이미지 파일 리스트를 배치 요청으로 변환
+
+        Parameters
+        ----------
+        paths : list[str]
+            이미지 경로명, 파일명 리스트
+        max_images : int
+            요청당 최대 이미지 수
+        max_bytes : int
+            요청당 최대 바이트 합계
+
+        Returns
+        -------
+        list[OcrResult]
+            파일 경로를 source 로 갖는 결과 리스트
+        """
+        items = []
+        for path in paths:
+            with io.open(path, 'rb') as image_file:
+                items.append((path, image_file.read()))
+        return self.detect_batch(items, max_images, max_bytes)
+
+    def close(self):
+        self.backend.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+# 엔진을 넘기지 않은 detect_img_text 호출이 공유할 기본 엔진
+_default_engine = None
+_default_engine_lock = threading.Lock()
+
+
+def get_default_engine():
+    """
+    모듈 단위로 공유되는 기본 OCR 엔진 반환, 최초 호출 시에만 Vision 클라이언트를 생성
+
+    Returns
+    -------
+    OcrEngine
+        Vision 백엔드를 사용하는 기본 엔진
+    """
+    global _default_engine
+    with _default_engine_lock:
+        if _default_engine is None:
+            _default_engine = OcrEngine()
+        return _default_engine
+
+
+def detect_img_text(path: str, engine: OcrEngine = None):
+    """
+    수령한 이미지를 vision api를 사용해 텍스트로 변환한 후 해당 텍스트 반환
+
+    Parameters
+    ----------
+    path : str
+        이미지 경로명, 파일명
+    engine : OcrEngine
+        사용할 OCR 엔진, 없으면 모듈 기본 엔진을 재사용
+
+    Returns
+    -------
+    str
+        이미지에서 추출한 full string
+    """
+    if engine is None:
+        engine = get_default_engine()
+    return engine.detect_img_text(path)
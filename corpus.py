@@ -0,0 +1,236 @@
+# 표준 라이브러리
+import os
+import io
+import re
+import glob
+import argparse
+# 3rd party
+import numpy as np
+import pandas as pd
+# 내부 패키지
+from extractor import BSN_CANDIDATE_REGEX, BSN_KEYWORD_PATTERN, BSN_WEIGHTS, OCR_DIGIT_TABLE
+from utils.utils_result import unescape_result_line
+
+# 적재된 OCR 결과(total_result_*.txt)에서 사업자 등록 번호를 일괄 재추출하는 bulk 모드
+# 결과 파일을 줄 단위로 읽어 문서 경계에서 chunk 로 나누므로 코퍼스 크기와 상관없이 메모리가 일정함
+# 문서 메타 줄(Img File/Business Number) 없이 'N번째 장:' 블록만 적힌 이전 형식의 결과 파일은 장마다 한 행으로 처리
+# > python corpus.py --input ./data/Output --output ./data/Output/reextract.csv --chunk_rows 50000
+# > python corpus.py --input ./data/Output/total_result_1618992408.txt --output ./data/Output/legacy.csv
+
+# 결과 파일의 페이지 시작 줄 ('N번째 장:'), 문서 메타 줄
+PAGE_MARKER_PATTERN = re.compile(r'^(?P<page_no>\d+)번째 장:$')
+IMG_FILE_PREFIX = 'Img File: '
+BSN_PREFIX = 'Business Number: '
+# 키워드 뒤의 후보를 함께 잡기 위해 후보 앞에 선택적인 키워드 구간을 붙인 패턴
+# (extract_bsn 의 "후보 앞 KEYWORD_WINDOW 글자 안 키워드" 가점을 같은 줄의 숫자 없는 구간으로 근사)
+BULK_BSN_PATTERN = re.compile('(?P<prefix>(?:' + BSN_KEYWORD_PATTERN.pattern + ')[^0-9\\n]{0,20})?'
+                              + BSN_CANDIDATE_REGEX)
+
+
+def has_document_lines(result_file: str):
+    """
+    결과 파일에 문서 메타 줄('Img File: ')이 있는지 확인 (없으면 페이지 블록만 적은 이전 형식)
+
+    Parameters
+    ----------
+    result_file : str
+        total_result_*.txt 경로
+
+    Returns
+    -------
+    bool
+        문서 메타 줄 존재 여부
+    """
+    with io.open(result_file, 'r', encoding='utf-8') as f:
+        return any(line.startswith(IMG_FILE_PREFIX) for line in f)
+
+
+def iter_result_pages(result_file: str):
+    """
+    결과 파일을 줄 단위로 읽어 문서별 페이지 텍스트를 차례로 반환
+    문서 메타 줄이 없는 이전 형식('N번째 장:' 블록만 있는 파일)은 페이지 블록 하나를 문서 하나로 보고
+    블록이 끝나는 대로 내보내므로, 어느 형식이든 한 번에 문서 하나의 페이지만 메모리에 둠
+    장 번호는 'N번째 장:' 에 적힌 번호를 그대로 사용하고 (현재 형식은 결과 레코드의 page 와 같은 문서 내 원본 장 번호),
+    페이지 텍스트 중 escape 된 줄(앞에 '\\' 가 붙은 구분 줄 모양의 줄)은 원래 텍스트로 복원
+
+    Parameters
+    ----------
+    result_file : str
+        total_result_*.txt 경로
+
+    Returns
+    -------
+    generator[tuple[str, str, list[tuple[int, str]]]]
+        (이미지 파일명, 결과 파일에 기록된 사업자 등록 번호, (장 번호, 페이지 텍스트) 리스트)
+        이전 형식은 파일명/번호가 None
+    """
+    legacy = not has_document_lines(result_file)
+    pages = []
+    lines = None
+    page_no = None
+    img_file = None
+    with io.open(result_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            marker = PAGE_MARKER_PATTERN.match(line)
+            if marker or line.startswith(IMG_FILE_PREFIX):
+                if lines is not None:
+                    pages.append((page_no, '\n'.join(lines).strip('\n')))
+                    if legacy:
+                        yield None, None, pages
+                        pages = []
+                if marker:
+                    page_no = int(marker.group('page_no'))
+                    lines = []
+                else:
+                    img_file = line[len(IMG_FILE_PREFIX):]
+                    lines = None
+            elif line.startswith(BSN_PREFIX) and lines is None and img_file is not None:
+                previous_bsn = line[len(BSN_PREFIX):]
+                yield img_file, None if previous_bsn == 'None' else previous_bsn, pages
+                pages = []
+                img_file = None
+            elif lines is not None:
+                lines.append(unescape_result_line(line))
+    # 메타 줄 없이 끝난 마지막 페이지 (이전 형식의 마지막 블록, 기록 도중 끊긴 문서)
+    if lines is not None:
+        pages.append((page_no, '\n'.join(lines).strip('\n')))
+    if pages:
+        yield img_file, None, pages
+
+
+def read_corpus(result_files: list, chunk_rows: int = 50000):
+    """
+    결과 파일들을 페이지 단위 행의 DataFrame chunk 로 읽음. 한 문서의 페이지는 같은 chunk 에 담김
+
+    Parameters
+    ----------
+    result_files : list[str]
+        total_result_*.txt 경로 리스트
+    chunk_rows : int
+        chunk 당 최소 행 수 (문서 경계에서 자름)
+
+    Returns
+    -------
+    generator[pandas.DataFrame]
+        source, file, doc_no, page, previous_bsn, text 컬럼의 DataFrame
+    """
+    rows = []
+    doc_no = 0
+    for result_file in result_files:
+        source = os.path.basename(result_file)
+        for img_file, previous_bsn, pages in iter_result_pages(result_file):
+            for page_no, text in pages:
+                rows.append((source, img_file, doc_no, page_no, previous_bsn, text))
+            if len(pages) == 0:
+                rows.append((source, img_file, doc_no, None, previous_bsn, ''))
+            doc_no += 1
+            if len(rows) >= chunk_rows:
+                yield pd.DataFrame(rows, columns=['source', 'file', 'doc_no', 'page', 'previous_bsn', 'text'])
+                rows = []
+    if rows:
+        yield pd.DataFrame(rows, columns=['source', 'file', 'doc_no', 'page', 'previous_bsn', 'text'])
+
+
+def extract_bsn_series(texts: pd.Series):
+    """
+    텍스트 Series 의 행마다 검증 숫자가 맞는 가장 유력한 사업자 등록 번호를 벡터 연산으로 추출
+    (extractor.extract_bsn 과 같은 정규화/검증/순위 규칙)
+
+    Parameters
+    ----------
+    texts : pandas.Series
+        OCR 텍스트 Series
+
+    Returns
+    -------
+    pandas.Series
+        texts 와 같은 index 의 'ddd-dd-ddddd' 번호 Series, 없으면 결측값
+    """
+    result = pd.Series(None, index=texts.index, dtype=object)
+    matches = texts.fillna('').str.extractall(BULK_BSN_PATTERN)
+    if len(matches) == 0:
+        return result
+    raw = matches['head'] + matches['mid'] + matches['tail']
+    digits = raw.str.translate(OCR_DIGIT_TABLE)
+    # 혼동 문자와 숫자는 모두 ASCII 이므로 한 번에 (행, 10) 숫자 배열로 변환
+    raw_arr = np.frombuffer(''.join(raw).encode('ascii'), dtype=np.uint8).reshape(-1, 10)
+    digit_arr = np.frombuffer(''.join(digits).encode('ascii'), dtype=np.uint8).reshape(-1, 10).astype(np.int64) - 48
+    total = digit_arr[:, :9] @ np.array(BSN_WEIGHTS) + digit_arr[:, 8] * 5 // 10
+    valid = (10 - total % 10) % 10 == digit_arr[:, 9]
+
+    sep1 = matches['sep1'].fillna('')
+    sep2 = matches['sep2'].fillna('')
+    has_sep1 = sep1.str.strip() != ''
+    has_sep2 = sep2.str.strip() != ''
+    score = (np.select([(sep1 == '-') & (sep2 == '-'), has_sep1 & has_sep2, has_sep1 | has_sep2], [3, 2, 1], 0)
+             - (raw_arr != digit_arr + 48).sum(axis=1)
+             + np.where(matches['prefix'].notna(), 2, 0))
+
+    bsn = digits.str[:3] + '-' + digits.str[3:5] + '-' + digits.str[5:]
+    candidates = pd.DataFrame({'row': matches.index.get_level_values(0),
+                               'match': matches.index.get_level_values(1),
+                               'score': score,
+                               'bsn': bsn.values})[valid]
+    best = candidates.sort_values(['row', 'score', 'match'], ascending=[True, False, True]) \
+        .drop_duplicates('row')
+    result.loc[best['row'].values] = best['bsn'].values
+    return result
+
+
+def extract_corpus(chunk: pd.DataFrame):
+    """
+    페이지 행 chunk 에서 문서별로 페이지 순서상 처음 나온 번호를 골라 문서 단위 결과로 변환
+
+    Parameters
+    ----------
+    chunk : pandas.DataFrame
+        read_corpus 가 만든 DataFrame
+
+    Returns
+    -------
+    pandas.DataFrame
+        source, file, page, pages, previous_bsn, bsn, changed 컬럼의 문서 단위 DataFrame
+        page 는 번호를 찾은 장 번호 (결과 레코드의 page 와 같은 기준), 번호가 없으면 첫 장 번호
+        (파일명이 없는 이전 형식의 행도 결과 파일에서 찾아볼 수 있도록)
+    """
+    chunk = chunk.assign(bsn=extract_bsn_series(chunk['text']))
+    docs = chunk.groupby('doc_no', sort=True).agg(
+        source=('source', 'first'), file=('file', 'first'), first_page=('page', 'min'), pages=('page', 'count'),
+        previous_bsn=('previous_bsn', 'first'))
+    found = chunk.dropna(subset=['bsn']).sort_values(['doc_no', 'page']).drop_duplicates('doc_no').set_index('doc_no')
+    docs['page'] = found['page'].reindex(docs.index).fillna(docs['first_page']).astype('Int64')
+    docs['bsn'] = found['bsn'].reindex(docs.index)
+    docs['changed'] = docs['bsn'].fillna('') != docs['previous_bsn'].fillna('')
+    return docs.reset_index(drop=True)[['source', 'file', 'page', 'pages', 'previous_bsn', 'bsn', 'changed']]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='적재된 OCR 결과에서 사업자 등록 번호 일괄 재추출')
+    parser.add_argument('--input', required=True, help='total_result_*.txt 가 있는 경로 혹은 결과 파일')
+    parser.add_argument('--output', required=True, help='문서별 재추출 결과 csv')
+    parser.add_argument('--chunk_rows', type=int, default=50000, help='chunk 당 페이지 행 수')
+    args = parser.parse_args()
+
+    if os.path.isdir(args.input):
+        result_files = sorted(glob.glob(os.path.join(args.input, 'total_result_*.txt')))
+    else:
+        result_files = [args.input]
+    doc_count = 0
+    changed_count = 0
+    header = True
+    for chunk in read_corpus(result_files, args.chunk_rows):
+        docs = extract_corpus(chunk)
+        # BOM 은 파일 처음에만 기록
+        docs.to_csv(args.output, mode='w' if header else 'a', header=header, index=False,
+                    encoding='utf-8-sig' if header else 'utf-8')
+        header = False
+        doc_count += len(docs)
+        changed_count += int(docs['changed'].sum())
+        print('문서 ' + str(doc_count) + '건 처리 (번호 변경 ' + str(changed_count) + '건)')
+    if doc_count == 0:
+        print('재추출할 페이지가 없습니다: ' + args.input)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,6 +5,10 @@ class DataBean:
     ABS_PATH = os.path.dirname(os.path.abspath(__file__))
     INPUT_ABS_PATH = ABS_PATH + "\\Input"
     OUTPUT_ABS_PATH = ABS_PATH + "\\Output"
+    OCR_CACHE_ABS_PATH = ABS_PATH + "\\OcrCache"
+    STATUS_CACHE_FILE = ABS_PATH + "\\status_cache.json"
+    PHASH_INDEX_FILE = ABS_PATH + "\\phash_index.db"
+    ROI_TEMPLATE_FILE = ABS_PATH + "\\roi_template.json"
 
     """
     data 폴더 내 데이터 접근을 위한 경로 관리용 init 모듈
@@ -17,5 +21,13 @@ class DataBean:
         Input 이미지 파일 경로
     OUTPUT_ABS_PATH : str
         수행 결과 txt 를 적재할 Output 경로
+    OCR_CACHE_ABS_PATH : str
+        이미지 해시 기반 OCR 결과 캐시 경로
+    STATUS_CACHE_FILE : str
+        사업자 등록 번호별 휴폐업 상태 캐시 파일
+    PHASH_INDEX_FILE : str
+        페이지 perceptual hash 와 OCR 결과 인덱스 (sqlite)
+    ROI_TEMPLATE_FILE : str
+        학습한 사업자 등록 번호 영역 템플릿 파일
     """
 
@@ -0,0 +1,196 @@
+# 표준 라이브러리
+import re
+from collections import namedtuple
+# 3rd party
+# 내부 패키지
+
+# OCR 이 숫자로 읽어야 할 자리에서 흔히 혼동하는 문자 -> 숫자
+OCR_DIGIT_TABLE = str.maketrans({'O': '0', 'o': '0', 'D': '0', 'Q': '0', 'I': '1', 'l': '1', '|': '1',
+                                 'Z': '2', 'S': '5', 's': '5', 'B': '8'})
+# 숫자 자리 (숫자 혹은 혼동 문자), 구분자 (하이픈류, 공백)
+_DIGIT = '[0-9OoDQIl|ZSsB]'
+_SEP = r'(?:[ \t]*[\-\u2010-\u2015\u2212~][ \t]*|[ \t]+)?'
+# 사업자 등록 번호 후보 패턴. 영문/숫자 중간에서 시작하거나 끝나는 후보는 제외
+BSN_CANDIDATE_REGEX = ('(?<![0-9A-Za-z])(?P<head>' + _DIGIT + '{3})(?P<sep1>' + _SEP + ')(?P<mid>' + _DIGIT
+                       + '{2})(?P<sep2>' + _SEP + ')(?P<tail>' + _DIGIT + '{5})(?![0-9A-Za-z])')
+BSN_CANDIDATE_PATTERN = re.compile(BSN_CANDIDATE_REGEX)
+# 그룹 이름 없는 같은 후보 패턴 (다른 패턴 안에서 경계로 쓰기 위함)
+_BSN_BOUNDARY_REGEX = '(?<![0-9A-Za-z])' + _DIGIT + '{3}' + _SEP + _DIGIT + '{2}' + _SEP + _DIGIT + '{5}(?![0-9A-Za-z])'
+# 후보 앞에 있으면 사업자 등록 번호일 가능성이 높은 표현
+BSN_KEYWORD_PATTERN = re.compile('등록\\s*번호|사업자')
+# 필드 값의 끝으로 볼 사업자 등록 번호 라벨 ('사업자' 단독은 '가나다 사업자 주식회사' 같은 상호에도 나오므로 제외)
+_BSN_LABEL_REGEX = '(?:사업자[ \t]*)?등록[ \t]*번호'
+# 후보 앞에서 키워드를 찾을 글자 수
+KEYWORD_WINDOW = 20
+# 체크섬 가중치 (마지막 자리는 검증 숫자)
+BSN_WEIGHTS = (1, 3, 7, 1, 3, 7, 1, 3, 5)
+
+# 사업자 등록 번호 후보. bsn 은 'ddd-dd-ddddd' 형식, raw 는 원문 그대로의 문자열, start 는 원문 위치
+BsnCandidate = namedtuple('BsnCandidate', ['bsn', 'raw', 'start', 'score'])
+
+
+def is_valid_bsn(digits: str):
+    """
+    사업자 등록 번호 10자리의 검증 숫자 확인
+
+    Parameters
+    ----------
+    digits : str
+        '-' 없는 숫자 10자리
+
+    Returns
+    -------
+    bool
+        검증 숫자 일치 여부
+    """
+    if len(digits) != 10 or not digits.isdigit():
+        return False
+    numbers = [int(digit) for digit in digits]
+    total = sum(number * weight for number, weight in zip(numbers, BSN_WEIGHTS))
+    total += numbers[8] * 5 // 10
+    return (10 - total % 10) % 10 == numbers[9]
+
+
+def _make_candidate(target_str: str, match_test):
+    # BSN_CANDIDATE_PATTERN 의 그룹을 가진 match 를 정규화/검증하여 후보로 변환, 검증 실패 시 None
+    raw_digits = match_test.group('head') + match_test.group('mid') + match_test.group('tail')
+    digits = raw_digits.translate(OCR_DIGIT_TABLE)
+    if not is_valid_bsn(digits):
+        return None
+    score = -sum(1 for raw, digit in zip(raw_digits, digits) if raw != digit)
+    separators = (match_test.group('sep1').strip(), match_test.group('sep2').strip())
+    if match_test.group('sep1') == '-' and match_test.group('sep2') == '-':
+        score += 3
+    elif all(separators):
+        score += 2
+    elif any(separators):
+        score += 1
+    start = match_test.start('head')
+    if BSN_KEYWORD_PATTERN.search(target_str, max(start - KEYWORD_WINDOW, 0), start):
+        score += 2
+    bsn = digits[:3] + '-' + digits[3:5] + '-' + digits[5:]
+    return BsnCandidate(bsn, target_str[start:match_test.end('tail')], start, score)
+
+
+def _rank_candidates(candidates: list):
+    # 번호별로 점수가 가장 높은 후보만 남기고 가능성 높은 순으로 정렬
+    best = {}
+    for candidate in candidates:
+        if candidate.bsn not in best or best[candidate.bsn].score < candidate.score:
+            best[candidate.bsn] = candidate
+    return sorted(best.values(), key=lambda candidate: (-candidate.score, candidate.start))
+
+
+def find_bsn_candidates(target_str: str):
+    """
+    OCR 결과 문자열에서 검증 숫자가 맞는 사업자 등록 번호 후보를 모두 찾아 가능성 순으로 정렬
+    공백/대시류 구분자와 O->0, I->1 같은 OCR 혼동 문자를 정규화한 뒤 검증하며,
+    정상 형식('-' 구분)일수록, 혼동 문자가 적을수록, '등록번호' 등의 키워드 뒤에 있을수록 앞에 옴
+
+    Parameters
+    ----------
+    target_str : str
+        OCR 결과 문자열
+
+    Returns
+    -------
+    list[BsnCandidate]
+        번호별로 중복을 제거한 후보 리스트 (가능성 높은 순)
+    """
+    if not target_str:
+        return []
+    candidates = [_make_candidate(target_str, match_test)
+                  for match_test in BSN_CANDIDATE_PATTERN.finditer(target_str)]
+    return _rank_candidates([candidate for candidate in candidates if candidate is not None])
+
+
+def extract_bsn(target_str):
+    """
+    Vision API 결과값에서 검증 숫자가 맞는 가장 유력한 사업자 등록 번호 추출
+    :param target_str: 번호를 찾을 원본 String
+    :return: 추출한 사업자 등록 번호 ('ddd-dd-ddddd'), 없을 경우 None이 return 됨
+    """
+    candidates = find_bsn_candidates(target_str)
+    return candidates[0].bsn if len(candidates) > 0 else None
+
+
+def _spaced(label: str):
+    # 등록증은 라벨 글자 사이를 띄워 인쇄하므로 ('상 호', '대 표 자') 글자 사이 공백을 허용
+    return '[ \t]*'.join(re.escape(char) for char in label)
+
+
+# 등록증 필드별 (라벨 리스트, 값 패턴). 필드를 추가해도 하나로 합친 패턴으로 한 번만 훑음
+CERTIFICATE_FIELDS = {
+    'company_name': (['법인명(단체명)', '법인명', '단체명', '상호'], r'[^\n]+?'),
+    'representative': (['대표자', '성명'], r'[^\n]+?'),
+    'opening_date': (['개업연월일', '개업일'], r'\d{4}[ \t]*[년.\-/][ \t]*\d{1,2}[ \t]*[월.\-/][ \t]*\d{1,2}[ \t]*일?'),
+    'business_type': (['업태'], r'[^\n]+?'),
+    'business_item': (['종목'], r'[^\n]+?'),
+}
+# 등록증 필드 추출 결과. 찾지 못한 필드는 None, opening_date 는 'YYYY-MM-DD'
+CertificateRecord = namedtuple('CertificateRecord', ['bsn'] + list(CERTIFICATE_FIELDS))
+
+
+def compile_certificate_pattern(fields: dict):
+    """
+    필드별 라벨/값 패턴과 사업자 등록 번호 후보 패턴을 하나의 alternation 패턴으로 합쳐 컴파일
+    값은 줄 끝, 두 칸 이상의 공백, 다른 필드 라벨, 혹은 사업자 등록 번호 (라벨 전체, 후보) 앞에서 끝나므로
+    같은 줄에 이어지는 번호를 값이 삼키지 않음
+
+    Parameters
+    ----------
+    fields : dict
+        {필드명: (라벨 리스트, 값 패턴)}
+
+    Returns
+    -------
+    re.Pattern
+        필드명을 그룹명으로 갖는 패턴 (bsn 후보는 'bsn' 그룹)
+    """
+    all_labels = '|'.join(_spaced(label) for labels, _ in fields.values() for label in labels)
+    value_end = ('(?=[ \t]{2,}|[ \t]*\n|$|[ \t]*(?:' + all_labels + '|' + _BSN_LABEL_REGEX + '|'
+                 + _BSN_BOUNDARY_REGEX + '))')
+    branches = ['(?P<bsn>' + BSN_CANDIDATE_REGEX + ')']
+    for field, (labels, value_regex) in fields.items():
+        branches.append('(?:' + '|'.join(_spaced(label) for label in labels) + ')[ \t]*[:：]?[ \t]*(?P<' + field
+                        + '>' + value_regex + ')' + value_end)
+    return re.compile('|'.join(branches), flags=re.MULTILINE)
+
+
+CERTIFICATE_PATTERN = compile_certificate_pattern(CERTIFICATE_FIELDS)
+# 개업일 숫자 부분
+_DATE_PARTS_PATTERN = re.compile(r'\d+')
+
+
+def extract_certificate(target_str: str):
+    """
+    사업자 등록증 OCR 결과에서 사업자 등록 번호와 상호, 대표자, 개업일, 업태/종목을 한 번의 탐색으로 추출
+    필드별로 처음 나온 값을 사용하고, 사업자 등록 번호는 검증된 후보 중 가장 유력한 번호를 사용
+
+    Parameters
+    ----------
+    target_str : str
+        OCR 결과 문자열
+
+    Returns
+    -------
+    CertificateRecord
+        추출 결과, 찾지 못한 필드는 None
+    """
+    values = dict.fromkeys(CertificateRecord._fields)
+    candidates = []
+    if target_str:
+        for match_test in CERTIFICATE_PATTERN.finditer(target_str):
+            field = match_test.lastgroup
+            if field == 'bsn':
+                candidate = _make_candidate(target_str, match_test)
+                if candidate is not None:
+                    candidates.append(candidate)
+            elif values[field] is None:
+                values[field] = match_test.group(field).strip()
+    candidates = _rank_candidates(candidates)
+    values['bsn'] = candidates[0].bsn if len(candidates) > 0 else None
+    if values['opening_date'] is not None:
+        year, month, day = _DATE_PARTS_PATTERN.findall(values['opening_date'])[:3]
+        values['opening_date'] = '{}-{:0>2}-{:0>2}'.format(year, month, day)
+    return CertificateRecord(**values)
@@ -0,0 +1,368 @@
+# 표준 라이브러리
+import asyncio
+import time
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, Future
+from xml.etree.ElementTree import XMLPullParser, ParseError
+from xml.sax.saxutils import unescape
+# 3rd party
+import requests
+from requests.adapters import HTTPAdapter
+# 내부 패키지
+
+HOMETAX_URL = 'https://teht.hometax.go.kr/wqAction.do?actionId=ATTABZAA001R08&screenId=UTEABAAA13&popupYn=false' \
+              '&realScreenId='
+HOMETAX_HEADERS = {'Content-Type': 'application/xml'}
+BODY_TEMPLATE = """<map id='ATTABZAA001R08'>
+            <pubcUserNo/>
+            <mobYn>N</mobYn>
+            <inqrTrgtClCd>1</inqrTrgtClCd>
+            <txprDscmNo>[사업자번호]</txprDscmNo>
+            <dongCode>__MIDDLE__</dongCode>
+            <psbSearch>Y</psbSearch>
+            <map id='userReqInfoVO'/>
+        </map>"""
+
+# 일괄 조회의 사업자 번호별 결과. 실패 시 text 는 None, error 에 원인이 담김
+HometaxResult = namedtuple('HometaxResult', ['bsn', 'text', 'error'])
+# 사업자 번호별 휴폐업 상태 조회 결과. 실패 시 status/desc 는 None, error 에 원인이 담김
+HometaxStatus = namedtuple('HometaxStatus', ['bsn', 'status', 'desc', 'fetched_at', 'error'])
+
+# 휴폐업 상태/설명이 담기는 응답 태그
+STATUS_TAG = 'smpcBmanTrtCntn'
+DESC_TAG = 'trtCntn'
+# 응답 파싱 결과 상태
+PARSE_OK = 'ok'
+PARSE_EMPTY = 'empty'
+PARSE_MISSING = 'missing'
+PARSE_MALFORMED = 'malformed'
+# 홈택스 응답 파싱 결과. state 가 PARSE_OK 가 아니면 찾은 값만 채워지고 나머지는 None
+HometaxParseResult = namedtuple('HometaxParseResult', ['status', 'desc', 'state'])
+
+
+class HometaxClient:
+    """
+    keep-alive 커넥션 풀을 가진 세션으로 홈택스 휴폐업 조회 API 를 호출하는 클라이언트
+    동시 요청 수를 제한하면서 여러 사업자 번호를 병렬로 조회할 수 있음
+
+    Attributes
+    ----------
+    session : requests.Session
+        커넥션 풀을 보유한 세션
+    max_in_flight : int
+        동시에 보낼 수 있는 최대 요청 수
+    timeout : tuple[float, float]
+        (connect, read) 요청별 타임아웃 (초)
+    status_cache : utils.utils_cache.StatusCache
+        run 간 공유되는 사업자 번호별 상태 TTL 캐시, None 이면 run 내 중복 제거만 수행
+        (run 안에서는 캐시 사용 여부와 상관없이 성공한 번호를 다시 요청하지 않음)
+    """
+
+    def __init__(self, max_in_flight: int = 4, timeout: tuple = (5.0, 15.0), status_cache=None):
+        if max_in_flight < 1:
+            raise ValueError('max_in_flight 는 1 이상이어야 합니다: ' + str(max_in_flight))
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(HOMETAX_HEADERS)
+        # 동시 요청 수만큼 커넥션을 풀에 유지하여 TCP/TLS 연결을 재사용
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_in_flight)
+        self.session.mount('https://', adapter)
+        self._semaphore = threading.BoundedSemaphore(max_in_flight)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        self.status_cache = status_cache
+        # 같은 번호의 동시 조회를 한 번의 요청으로 합치기 위한 진행 중인 번호별 조회 Future (끝나면 제거)
+        self._lookups = {}
+        # 클라이언트(run) 동안 성공한 번호별 조회 결과. 실패한 조회는 담지 않아 다음 조회에서 다시 요청
+        self._results = {}
+        self._lookups_lock = threading.Lock()
+
+    def send(self, bsn: str):
+        """
+        사업자 등록 번호 하나를 홈택스에 조회
+
+        Parameters
+        ----------
+        bsn : str
+            API에 송신할 사업자 등록 번호 ('-' 포함 여부 무관)
+
+        Returns
+        -------
+        str
+            API의 결과값 String
+        """
+        body = BODY_TEMPLATE.replace("[사업자번호]", bsn.replace("-", ""))
+        with self._semaphore:
+            response = self.session.post(url=HOMETAX_URL, data=body.encode('utf-8'), timeout=self.timeout)
+        if not response.ok:
+            raise Exception('{}'.format(response.text))
+        return response.text
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight,
+                                                    thread_name_prefix='hometax')
+            return self._executor
+
+    def _send_result(self, bsn: str):
+        try:
+            return HometaxResult(bsn, self.send(bsn), None)
+        except Exception as e:
+            return HometaxResult(bsn, None, e)
+
+    def send_many(self, bsn_list: list):
+        """
+        여러 사업자 등록 번호를 동시 요청 수 제한 안에서 병렬 조회
+
+        Parameters
+        ----------
+        bsn_list : list[str]
+            조회할 사업자 등록 번호 리스트, 중복은 한 번만 조회
+
+        Returns
+        -------
+        dict[str, HometaxResult]
+            {사업자 등록 번호: 조회 결과}
+        """
+        unique_list = list(dict.fromkeys(bsn for bsn in bsn_list if bsn is not None))
+        return {result.bsn: result for result in self._get_executor().map(self._send_result, unique_list)}
+
+    async def send_async(self, bsn_list: list):
+        """
+        send_many 의 asyncio 진입점, 이벤트 루프를 막지 않고 풀 스레드에서 조회
+
+        Parameters
+        ----------
+        bsn_list : list[str]
+            조회할 사업자 등록 번호 리스트
+
+        Returns
+        -------
+        dict[str, HometaxResult]
+            {사업자 등록 번호: 조회 결과}
+        """
+        loop = asyncio.get_event_loop()
+        unique_list = list(dict.fromkeys(bsn for bsn in bsn_list if bsn is not None))
+        results = await asyncio.gather(*[loop.run_in_executor(self._get_executor(), self._send_result, bsn)
+                                         for bsn in unique_list])
+        return {result.bsn: result for result in results}
+
+    def lookup(self, bsn: str):
+        """
+        사업자 등록 번호의 휴폐업 상태 조회. 같은 번호는 동시에 조회해도 한 번만 요청하고 성공한 결과는 클라이언트가
+        살아있는 동안 재사용하며, 상태 캐시에 신선한 값이 있으면 홈택스를 호출하지 않음
+        (실패한 조회는 재사용하지 않고 다음 조회에서 다시 요청)
+
+        Parameters
+        ----------
+        bsn : str
+            조회할 사업자 등록 번호
+
+        Returns
+        -------
+        HometaxStatus
+            조회 결과
+        """
+        # '-' 유무와 상관 없이 같은 번호로 취급
+        key = bsn.replace("-", "")
+        with self._lookups_lock:
+            if key in self._results:
+                return self._results[key]._replace(bsn=bsn)
+            future = self._lookups.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._lookups[key] = future
+        if not is_owner:
+            return future.result()._replace(bsn=bsn)
+
+        result = None
+        try:
+            cached = self.status_cache.get(key) if self.status_cache is not None else None
+            if cached is not None:
+                result = HometaxStatus(bsn, cached[0], cached[1], cached[2], None)
+            else:
+                parsed = parse_status(self.send(bsn))
+                if parsed.state != PARSE_OK:
+                    raise Exception('홈택스 응답에서 상태를 읽지 못했습니다 (' + parsed.state + '): ' + bsn)
+                result = HometaxStatus(bsn, parsed.status, parsed.desc, time.time(), None)
+                if self.status_cache is not None:
+                    self.status_cache.put(key, parsed.status, parsed.desc, result.fetched_at)
+        except Exception as e:
+            result = HometaxStatus(bsn, None, None, None, e)
+        finally:
+            # 진행 중 목록에서는 빼고, 성공한 결과만 run 동안 보관 (실패한 번호는 다음 조회에서 다시 요청)
+            with self._lookups_lock:
+                del self._lookups[key]
+                if result is not None and result.error is None:
+                    self._results[key] = result
+        future.set_result(result)
+        return result
+
+    def lookup_many(self, bsn_list: list):
+        """
+        여러 사업자 등록 번호의 상태를 중복 없이 병렬 조회
+
+        Parameters
+        ----------
+        bsn_list : list[str]
+            조회할 사업자 등록 번호 리스트
+
+        Returns
+        -------
+        dict[str, HometaxStatus]
+            {사업자 등록 번호: 조회 결과}
+        """
+        unique_list = list(dict.fromkeys(bsn for bsn in bsn_list if bsn is not None))
+        return {result.bsn: result for result in self._get_executor().map(self.lookup, unique_list)}
+
+    def close(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+# client 를 넘기지 않은 send_hometax 호출이 공유할 기본 클라이언트
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client():
+    """
+    모듈 단위로 공유되는 기본 홈택스 클라이언트 반환
+
+    Returns
+    -------
+    HometaxClient
+        기본 설정의 클라이언트
+    """
+    global _default_client
+    with _default_client_lock:
+        if _default_client is None:
+            _default_client = HometaxClient()
+        return _default_client
+
+
+def send_hometax(bsn, client: HometaxClient = None):
+    """
+    추출한 사업자 등록 번호를 홈텍스 내부 API에 담아 보내 해당 사업자의 상태를 조회
+    :param bsn: API에 송신할 사업자 등록 번호
+    :param client: 사용할 홈택스 클라이언트, 없으면 모듈 기본 클라이언트를 재사용
+    :return: API의 결과값을 String으로 반환
+    """
+    # 홈택스에 XML 요청
+    if bsn is not None:
+        if client is None:
+            client = get_default_client()
+        return client.send(bsn)
+
+
+def _collect_status_values(parser: XMLPullParser, values: dict):
+    # 끝난 태그 중 찾는 태그의 첫 값만 담고, 읽은 요소는 비워 메모리를 일정하게 유지
+    for _, element in parser.read_events():
+        if element.tag in values and values[element.tag] is None:
+            values[element.tag] = (element.text or '').strip() or None
+        element.clear()
+
+
+def parse_status_stream(chunks):
+    """
+    홈택스 응답을 조각 단위로 XML pull 파싱하여 휴폐업 상태/설명 추출
+    응답 전체를 정규표현식으로 되짚지 않고 한 번만 읽으며, 두 값을 모두 찾으면 나머지는 읽지 않음
+
+    Parameters
+    ----------
+    chunks : iterable[str | bytes]
+        응답 본문 조각 (requests 의 iter_content 등)
+
+    Returns
+    -------
+    HometaxParseResult
+        추출 결과와 파싱 상태
+    """
+    parser = XMLPullParser(events=('end',))
+    values = {STATUS_TAG: None, DESC_TAG: None}
+    received = False
+    try:
+        for chunk in chunks:
+            if not chunk:
+                continue
+            received = True
+            parser.feed(chunk)
+            _collect_status_values(parser, values)
+            if values[STATUS_TAG] is not None and values[DESC_TAG] is not None:
+                return HometaxParseResult(values[STATUS_TAG], values[DESC_TAG], PARSE_OK)
+        if not received:
+            return HometaxParseResult(None, None, PARSE_EMPTY)
+        parser.close()
+        _collect_status_values(parser, values)
+    except ParseError:
+        return HometaxParseResult(values[STATUS_TAG], values[DESC_TAG], PARSE_MALFORMED)
+    state = PARSE_OK if values[STATUS_TAG] is not None and values[DESC_TAG] is not None else PARSE_MISSING
+    return HometaxParseResult(values[STATUS_TAG], values[DESC_TAG], state)
+
+
+def _scan_tag(target_str: str, tag: str, start: int = 0):
+    # start 이후 처음 나오는 <tag>...</tag> 의 (텍스트, 닫는 태그 끝 위치) 반환, 없으면 None, 닫히지 않았으면 ParseError
+    open_tag = '<' + tag + '>'
+    begin = target_str.find(open_tag, start)
+    if begin < 0:
+        return None
+    begin += len(open_tag)
+    end = target_str.find('</' + tag + '>', begin)
+    if end < 0 or '<' in target_str[begin:end]:
+        raise ParseError('닫히지 않은 태그: ' + tag)
+    return unescape(target_str[begin:end]).strip() or None, end + len(tag) + 3
+
+
+def parse_status(target_str: str):
+    """
+    홈택스 API 응답 문자열에서 휴폐업 상태/설명 추출
+    태그 위치를 앞에서부터 한 번씩만 찾는 선형 탐색으로, 응답 크기나 형태와 상관없이 되짚지 않음
+    (응답을 조각으로 받는 경우엔 parse_status_stream 사용)
+
+    Parameters
+    ----------
+    target_str : str
+        홈택스 API로부터 수신한 String
+
+    Returns
+    -------
+    HometaxParseResult
+        추출 결과와 파싱 상태 (PARSE_OK, PARSE_EMPTY, PARSE_MISSING, PARSE_MALFORMED)
+    """
+    if not target_str:
+        return HometaxParseResult(None, None, PARSE_EMPTY)
+    status = None
+    try:
+        status_found = _scan_tag(target_str, STATUS_TAG)
+        if status_found is None:
+            return HometaxParseResult(None, None, PARSE_MISSING)
+        status = status_found[0]
+        desc_found = _scan_tag(target_str, DESC_TAG, status_found[1])
+    except ParseError:
+        return HometaxParseResult(status, None, PARSE_MALFORMED)
+    desc = desc_found[0] if desc_found is not None else None
+    return HometaxParseResult(status, desc, PARSE_OK if status is not None and desc is not None else PARSE_MISSING)
+
+
+def extract_status(target_str):
+    """
+    홈텍스 API에서 수신한 결과값에서 특정 태그에 달린 상태/설명 문자열을 추출하여 리스트 객체에 담아 리턴함
+    (파싱 실패 원인이 필요하면 parse_status 사용)
+    :param target_str: 홈텍스 API로부터 수신한 String
+    :return: 추출한 상태/설명을 담은 리스트 객체
+    """
+    parsed = parse_status(target_str)
+    return [parsed.status, parsed.desc]
@@ -1,90 +1,566 @@
 # 표준 라이브러리
 import os
-import re
 import io
 import sys
 import time
+import threading
+from functools import partial
+from contextlib import nullcontext
 # 3rd party
-import requests
 import cloud_vision
 # 내부 패키지
 from utils.utils_config import get_configs
 from utils.utils_logs import create_logger
 from utils.utils_io import make_dir
-from utils.utils_img import move_img
+from utils.utils_img import prepare_img, move_img, load_page_bytes, optimize_for_ocr, is_within_ocr_budget, \
+    extract_pdf_text, is_blank_page, RenderProfile
+from utils.utils_cache import OcrCache, StatusCache
+from utils.utils_manifest import IngestManifest
+from utils.utils_phash import PhashIndex
+from utils.utils_roi import RoiTemplate
+from utils.utils_result import create_sink, escape_result_text, RESULT_FIELDS
+from pipeline import Pipeline, Stage, Prefetcher
+from hometax import HometaxClient
+from watcher import FolderWatcher
+from mosaic import MosaicOcr
+from extractor import extract_bsn, extract_certificate, CertificateRecord
 
 from config import ConfigBean
 from data import DataBean
 
 
-def extract_bsn(target_str):
+def read_text_layer(doc: dict, original_path: str, min_chars: int, my_logger):
     """
-    Vision API 결과값에서 사업자 등록 번호를 패턴에 따라 정규표현식을 사용하여 추출
-    :param target_str: 정규표현식을 적용할 원본 String
-    :return: 추출한 사업자 등록 번호, 없을 경우 None이 return 됨
+    파이프라인 텍스트 레이어 단계. pdf 에 내장된 텍스트에서 사업자 등록 번호가 나오면 래스터화/OCR 을 건너뜀
+    번호가 없으면 페이지별 텍스트 레이어를 남겨두어 OCR 단계가 텍스트가 없는 페이지만 요청하도록 함
+
+    Parameters
+    ----------
+    doc : dict
+        {'file': 원본 파일명} 형태의 문서 객체
+    original_path : str
+        원본 파일 경로
+    min_chars : int
+        텍스트 레이어를 사용할 수 있다고 볼 페이지당 최소 글자 수
+    my_logger : Logger
+        사용할 로깅 객체
+
+    Returns
+    -------
+    dict
+        'text_layer' 키가 추가된 문서 객체, 번호를 찾았으면 'texts', 'text_pages', 'bsn' 도 채워짐
+    """
+    doc['text_layer'] = []
+    doc['skip_ocr'] = False
+    if not doc['file'].lower().endswith('.pdf'):
+        return doc
+    try:
+        page_texts = extract_pdf_text(original_path + doc['file'])
+    except Exception as ex:
+        my_logger.warning("pdf 텍스트 레이어 추출 실패, OCR 로 진행: " + doc['file'] + " -> {}".format(ex))
+        return doc
+    doc['text_layer'] = [page_text if len(page_text.strip()) >= min_chars else '' for page_text in page_texts]
+    for page_text in doc['text_layer']:
+        bsn = extract_bsn(page_text)
+        if bsn is not None:
+            my_logger.info(doc['file'] + " 텍스트 레이어에서 사업자 등록 번호 추출, OCR 생략")
+            doc['text_pages'] = [page_no for page_no, page_text in enumerate(doc['text_layer'], start=1)
+                                 if page_text != '']
+            doc['texts'] = [doc['text_layer'][page_no - 1] for page_no in doc['text_pages']]
+            doc['bsn'] = bsn
+            doc['skip_ocr'] = True
+            break
+    return doc
+
+
+def rasterize_document(doc: dict, original_path: str, target_path: str, my_logger, page_window: int = 1,
+                       in_memory: bool = True, save_preprocessed: bool = False, manifest: IngestManifest = None,
+                       render_profile: RenderProfile = None, prefetch: int = 1,
+                       limiter: threading.Semaphore = None):
+    """
+    파이프라인 래스터화 단계. 원본 파일을 페이지별 이미지 바이트로 변환하여 문서에 담음
+
+    Parameters
+    ----------
+    doc : dict
+        {'file': 원본 파일명} 형태의 문서 객체
+    original_path : str
+        원본 파일 경로
+    target_path : str
+        이미지 적재 경로
+    my_logger : Logger
+        사용할 로깅 객체
+    page_window : int
+        pdf 를 한 번에 렌더링할 페이지 수
+    in_memory : bool
+        True 면 렌더링 결과를 메모리에서 바로 OCR 로 넘김, False 면 target_path 에 적재된 이미지를 읽어 사용
+    save_preprocessed : bool
+        in_memory 일 때 페이지 이미지를 감사용으로 target_path 에 남길지 여부
+    manifest : IngestManifest
+        in_memory 가 아닐 때 사용할 적재 이력 manifest
+    render_profile : RenderProfile
+        OCR 목표 해상도/색상 렌더링 설정
+    prefetch : int
+        뒤 단계가 가져가기 전에 미리 렌더링해 둘 페이지 수
+    limiter : threading.Semaphore
+        여러 문서의 페이지 렌더링 동시 수행 수 제한, None 이면 제한 없음
+
+    Returns
+    -------
+    dict
+        'pages' 키((페이지 이미지명, 이미지 바이트) iterator)가 추가된 문서 객체
+        페이지는 별도 스레드에서 prefetch 장까지만 앞서 렌더링되므로 OCR 과 겹쳐 수행되면서도
+        문서 전체 페이지를 메모리에 들고 있지 않음
+    """
+    if doc.get('skip_ocr'):
+        doc['pages'] = iter([])
+        return doc
+    # 메모리에서 렌더링한 pdf 페이지는 이미 OCR 업로드 품질로 인코딩되어 있음
+    doc['ocr_encoded'] = in_memory and render_profile is not None and doc['file'].lower().endswith('.pdf')
+    if in_memory:
+        pages = load_page_bytes(doc['file'], original_path, my_logger, page_window,
+                                target_path if save_preprocessed else None, render_profile)
+    else:
+        img_list = prepare_img(doc['file'], original_path, target_path, my_logger, page_window, manifest,
+                               render_profile)
+        pages = _read_page_files(img_list) if img_list is not None else None
+    if pages is None:
+        raise Exception('이미지 전처리 실패: ' + doc['file'])
+    doc['pages'] = Prefetcher(pages, prefetch, limiter)
+    return doc
+
+
+def _read_page_files(img_list: list):
+    # 적재된 페이지 이미지를 요청받을 때 한 장씩 읽음
+    for img_file in img_list:
+        with io.open(img_file, 'rb') as f:
+            yield img_file, f.read()
+
+
+def triage_document(doc: dict, ink_threshold: float, std_threshold: float, my_logger, prefetch: int = 1,
+                    limiter: threading.Semaphore = None):
     """
-    p = re.compile(pattern='(?P<bsn>\d{3}-\d{2}-\d{5})')
-    bsn = None
+    파이프라인 빈 페이지 선별 단계. 잉크 비율과 밝기 편차가 모두 기준 미만인 페이지를 OCR 대상에서 제외
+    (페이지 순서를 유지해야 하므로 지우지 않고 'blank_pages' 에 index 만 기록)
+
+    Parameters
+    ----------
+    doc : dict
+        'pages' 를 가진 문서 객체
+    ink_threshold : float
+        빈 페이지로 볼 잉크 비율 상한
+    std_threshold : float
+        빈 페이지로 볼 밝기 표준편차 상한
+    my_logger : Logger
+        사용할 로깅 객체
+    prefetch : int
+        뒤 단계가 가져가기 전에 미리 판정해 둘 페이지 수
+    limiter : threading.Semaphore
+        여러 문서의 빈 페이지 판정 동시 수행 수 제한, None 이면 제한 없음
+
+    Returns
+    -------
+    dict
+        'blank_pages' 키가 추가된 문서 객체. 별도 스레드에서 페이지를 한 장씩 넘겨받는 대로 판정하며,
+        페이지를 내보내기 전에 빈 페이지면 'blank_pages' 에 index 가 기록됨
+    """
+    doc['blank_pages'] = set()
+    if doc.get('skip_ocr'):
+        return doc
+    doc['pages'] = Prefetcher(_triage_pages(doc, doc['pages'], ink_threshold, std_threshold, my_logger, limiter),
+                              prefetch)
+    return doc
+
+
+def _triage_pages(doc: dict, pages, ink_threshold: float, std_threshold: float, my_logger,
+                  limiter: threading.Semaphore = None):
+    # 앞 단계 페이지를 기다리는 동안에는 허가를 잡지 않도록 판정할 때만 limiter 를 잡음
+    slot = limiter if limiter is not None else nullcontext()
     try:
-        match_test = p.search(target_str)
-        if match_test is not None:
-            bsn = match_test.group('bsn')
-    except Exception as e:
-        print(e)
+        for index, (page_name, content) in enumerate(pages):
+            with slot:
+                is_blank, ink_ratio, std = is_blank_page(content, ink_threshold, std_threshold)
+            if is_blank:
+                doc['blank_pages'].add(index)
+                my_logger.info("빈 페이지 제외: " + page_name + " (ink=" + format(ink_ratio, '.5f')
+                               + ", std=" + format(std, '.2f') + ")")
+            yield page_name, content
     finally:
-        return bsn
-
-
-def send_hometax(bsn):
-    """
-    추출한 사업자 등록 번호를 홈텍스 내부 API에 담아 보내 해당 사업자의 상태를 조회
-    :param bsn: API에 송신할 사업자 등록 번호
-    :return: API의 결과값을 String으로 반환
-    """
-    body_template = """<map id='ATTABZAA001R08'>
-            <pubcUserNo/>
-            <mobYn>N</mobYn>
-            <inqrTrgtClCd>1</inqrTrgtClCd>
-            <txprDscmNo>[사업자번호]</txprDscmNo>
-            <dongCode>__MIDDLE__</dongCode>
-            <psbSearch>Y</psbSearch>
-            <map id='userReqInfoVO'/>
-        </map>"""
-    headers = {'Content-Type': 'application/xml'}
-    hometax_url = 'https://teht.hometax.go.kr/wqAction.do?actionId=ATTABZAA001R08&screenId=UTEABAAA13&popupYn=false' \
-                  '&realScreenId='
-
-    # 홈택스에 XML 요청
-    if bsn is not None:
-        body = body_template.replace("[사업자번호]", bsn.replace("-", ""))
-        response = requests.post(url=hometax_url, headers=headers, data=body)
-        return_text = ""
-        if not response.ok:
-            raise Exception('{}'.format(response.text))
-        else:
-            return_text = response.text
-
-        return return_text
-
-
-def extract_status(target_str):
-    """
-    홈텍스 API에서 수신한 결과값에서 특정 태그에 달린 상태/설명 문자열을 추출하여 리스트 객체에 담아 리턴함
-    :param target_str: 홈텍스 API로부터 수신한 String
-    :return: 추출한 상태/설명을 담은 리스트 객체
-    """
-    p = re.compile(pattern='<smpcBmanTrtCntn>(?P<status>[^<]+).+<trtCntn>(?P<desc>[^<]+)', flags=re.UNICODE)
-    status = None
-    desc = None
+        pages.close()
+        if len(doc['blank_pages']) > 0:
+            my_logger.info(doc['file'] + " 빈 페이지 " + str(len(doc['blank_pages'])) + "장 제외")
+
+
+def optimize_document(doc: dict, max_pixels: int, grayscale: bool, quality: int, my_logger, prefetch: int = 1,
+                      limiter: threading.Semaphore = None):
+    """
+    파이프라인 업로드 최적화 단계. 페이지 이미지를 픽셀 예산/흑백/JPEG 품질에 맞춰 줄여 업로드 크기를 낮춤
+
+    Parameters
+    ----------
+    doc : dict
+        'pages' 를 가진 문서 객체
+    max_pixels : int
+        페이지당 최대 픽셀 수
+    grayscale : bool
+        흑백 변환 여부
+    quality : int
+        JPEG 인코딩 품질
+    my_logger : Logger
+        사용할 로깅 객체
+    prefetch : int
+        뒤 단계가 가져가기 전에 미리 최적화해 둘 페이지 수
+    limiter : threading.Semaphore
+        여러 문서의 페이지 최적화 동시 수행 수 제한, None 이면 제한 없음
+
+    Returns
+    -------
+    dict
+        'pages' 가 별도 스레드에서 최적화된 이미지 바이트를 한 장씩 돌려주는 iterator 로 바뀐 문서 객체
+    """
+    if doc.get('skip_ocr'):
+        return doc
+    doc['pages'] = Prefetcher(_optimize_pages(doc, doc['pages'], max_pixels, grayscale, quality, my_logger,
+                                              limiter), prefetch)
+    return doc
+
+
+def _optimize_pages(doc: dict, pages, max_pixels: int, grayscale: bool, quality: int, my_logger,
+                    limiter: threading.Semaphore = None):
+    slot = limiter if limiter is not None else nullcontext()
+    origin_bytes = 0
+    optimized_bytes = 0
+    try:
+        for index, (page_name, content) in enumerate(pages):
+            origin_bytes += len(content)
+            # 빈 페이지와, 렌더링 때 이미 예산 안으로 인코딩된 페이지는 다시 디코딩/인코딩하지 않음
+            is_encoded = doc.get('ocr_encoded') and is_within_ocr_budget(content, max_pixels, grayscale)
+            if index not in doc.get('blank_pages', ()) and not is_encoded:
+                with slot:
+                    content = optimize_for_ocr(content, max_pixels, grayscale, quality)
+            optimized_bytes += len(content)
+            yield page_name, content
+    finally:
+        pages.close()
+        if origin_bytes > 0:
+            my_logger.info(doc['file'] + " 업로드 크기: " + str(origin_bytes) + " -> " + str(optimized_bytes)
+                           + " bytes")
+
+
+def ocr_roi_pages(window_pages: list, ocr_engine, roi_template: RoiTemplate, batch_size: int, my_logger,
+                  mosaic_ocr: MosaicOcr = None):
+    """
+    페이지의 번호 영역(ROI)만 잘라 먼저 OCR 하고, 영역에서 사업자 등록 번호가 나오지 않은 페이지만 전체 OCR
+    전체 OCR 에서 번호가 나오면 단어 위치로 ROI 템플릿을 학습함 (캐시에서 텍스트만 가져온 페이지는 학습하지 않음)
+
+    Parameters
+    ----------
+    window_pages : list[tuple[int, tuple[str, bytes]]]
+        (페이지 index, (페이지 이미지명, 이미지 바이트)) 리스트
+    ocr_engine : cloud_vision.OcrEngine
+        run 동안 공유하는 OCR 엔진
+    roi_template : RoiTemplate
+        번호 영역 템플릿
+    batch_size : int
+        batch_annotate_images 한 요청에 묶을 이미지 수
+    my_logger : Logger
+        사용할 로깅 객체
+    mosaic_ocr : MosaicOcr
+        ROI 를 여러 장씩 한 캔버스로 묶어 보낼 모자이크 OCR, None 이면 ROI 마다 한 장씩 요청
+
+    Returns
+    -------
+    list[tuple[int, str]]
+        (페이지 index, 텍스트) 리스트, ROI 에서 번호를 찾은 페이지는 ROI 텍스트만 담기고 실패한 페이지는 None
+    """
+    texts = {}
+    crops = []
+    for index, (page_name, content) in window_pages:
+        try:
+            crop = roi_template.crop(content)
+        except Exception as ex:
+            my_logger.warning("ROI 자르기 실패, 전체 페이지로 진행: " + page_name + " -> {}".format(ex))
+            continue
+        if crop is not None:
+            crops.append((index, (page_name + '#roi', crop)))
+    detect_batch = mosaic_ocr.detect_batch if mosaic_ocr is not None else ocr_engine.detect_batch
+    ocr_results = detect_batch([item for _, item in crops], max_images=batch_size)
+    for (index, _), ocr_result in zip(crops, ocr_results):
+        if ocr_result.error is None and extract_bsn(ocr_result.text) is not None:
+            texts[index] = ocr_result.text
+
+    fallback_pages = [(index, page) for index, page in window_pages if index not in texts]
+    layout_results = ocr_engine.detect_layout_batch([page for _, page in fallback_pages], max_images=batch_size)
+    for (index, (page_name, content)), layout_result in zip(fallback_pages, layout_results):
+        if layout_result.error is not None:
+            my_logger.error("OCR 실패: " + layout_result.source + " -> {}".format(layout_result.error))
+            texts[index] = None
+            continue
+        texts[index] = layout_result.text
+        if layout_result.words is not None and roi_template.learn(content, layout_result.words):
+            my_logger.info("ROI 학습: " + page_name + " -> " + ', '.join(format(value, '.3f')
+                                                                        for value in roi_template.region))
+    if len(fallback_pages) > 0:
+        my_logger.info("ROI 에서 번호를 찾지 못해 전체 페이지 OCR: " + str(len(fallback_pages)) + "/"
+                       + str(len(window_pages)) + "장")
+    return [(index, texts[index]) for index, _ in window_pages]
+
+
+def ocr_document(doc: dict, ocr_engine, batch_size: int, my_logger, full_text: bool = True, page_window: int = 1,
+                 roi_template: RoiTemplate = None, mosaic_ocr: MosaicOcr = None):
+    """
+    파이프라인 OCR 단계. 문서의 페이지를 OCR 하여 페이지별 텍스트를 문서에 담음
+    full_text 가 아니면 앞 페이지부터 page_window 장씩 요청하고 사업자 등록 번호가 나오면 남은 페이지는 요청하지 않음
+    roi_template 이 있으면 페이지마다 번호 영역만 먼저 OCR 하고, 영역에서 번호가 나오지 않을 때만 전체 페이지를 OCR
+    (영역에서 번호를 찾은 페이지의 텍스트는 영역 안의 텍스트뿐이므로 결과 파일/등록증 필드도 영역 밖 내용은 빠짐)
+    mosaic_ocr 가 있으면 텍스트만 필요한 요청을 다른 페이지/문서의 요청과 한 캔버스로 묶어 보냄
+
+    Parameters
+    ----------
+    doc : dict
+        'pages' ((페이지 이미지명, 이미지 바이트) iterator)를 가진 문서 객체
+    ocr_engine : cloud_vision.OcrEngine
+        run 동안 공유하는 OCR 엔진
+    batch_size : int
+        batch_annotate_images 한 요청에 묶을 이미지 수 (full_text 면 이만큼씩 모아 요청)
+    my_logger : Logger
+        사용할 로깅 객체
+    full_text : bool
+        True 면 모든 페이지의 전문을 OCR, False 면 번호를 찾는 즉시 중단
+    page_window : int
+        full_text 가 아닐 때 한 번에 요청할 페이지 수
+    roi_template : RoiTemplate
+        번호 영역 템플릿, None 이면 항상 전체 페이지를 OCR
+    mosaic_ocr : MosaicOcr
+        모자이크 OCR, None 이면 페이지마다 한 장씩 요청
+
+    Returns
+    -------
+    dict
+        'texts', 'text_pages' (texts 각 항목의 원본 장 번호), 'page_count' (원본 페이지 수), 'page_names' 키가
+        추가된 문서 객체 (OCR 이 끝난 페이지 이미지 바이트는 메모리에서 해제)
+    """
+    doc['page_names'] = []
+    # 텍스트 레이어가 있는 페이지는 그대로 사용하고 나머지 페이지만 OCR 요청
+    text_layer = doc.get('text_layer', [])
+    if doc.get('skip_ocr'):
+        doc['page_count'] = len(text_layer)
+        doc['pages'] = []
+        return doc
+    window = max(batch_size if full_text else page_window, 1)
+    page_texts = []
+    window_pages = []
+    stopped = False
+    # 페이지는 한 장씩 넘겨받아 window 장이 모일 때마다 요청하므로 문서의 모든 페이지 이미지를 한 번에 들고 있지 않음
+    pages = doc['pages']
     try:
-        match_test = p.search(target_str)
-        if match_test is not None:
-            status = match_test.group('status')
-            desc = match_test.group('desc')
-    except Exception as e:
-        print(e)
+        for index, (page_name, content) in enumerate(pages):
+            doc['page_names'].append(page_name)
+            if index in doc.get('blank_pages', ()):
+                # 빈 페이지는 OCR 하지 않고 결과에서도 제외
+                page_texts.append(None)
+            elif index < len(text_layer) and text_layer[index] != '':
+                page_texts.append(text_layer[index])
+            else:
+                page_texts.append('')
+                window_pages.append((index, (page_name, content)))
+            if len(window_pages) < window:
+                continue
+            stopped = ocr_page_window(window_pages, page_texts, ocr_engine, batch_size, my_logger, full_text,
+                                      roi_template, mosaic_ocr)
+            window_pages = []
+            if stopped:
+                my_logger.info(doc['file'] + " " + str(index + 1) + "장에서 사업자 등록 번호 확보, 남은 페이지 렌더링/OCR 생략")
+                break
+        if len(window_pages) > 0:
+            ocr_page_window(window_pages, page_texts, ocr_engine, batch_size, my_logger, full_text, roi_template,
+                            mosaic_ocr)
     finally:
-        return [status, desc]
+        pages.close()
+    # 렌더링하지 않은 뒤 페이지도 텍스트 레이어는 그대로 사용
+    page_texts.extend(page_text or None for page_text in text_layer[len(page_texts):])
+    # 빈 페이지 등을 뺀 texts 의 위치가 아니라 원본 장 번호로 결과를 기록하도록 함께 보관
+    doc['text_pages'] = [index + 1 for index, page_text in enumerate(page_texts) if page_text is not None]
+    doc['texts'] = [page_texts[page_no - 1] for page_no in doc['text_pages']]
+    doc['page_count'] = len(page_texts)
+    # 뒤 단계는 페이지 이미지명만 사용하므로 이미지 바이트는 OCR 이 끝나면 놓아 줌
+    doc['pages'] = []
+    return doc
+
+
+def ocr_page_window(window_pages: list, page_texts: list, ocr_engine, batch_size: int, my_logger,
+                    full_text: bool = True, roi_template: RoiTemplate = None, mosaic_ocr: MosaicOcr = None):
+    """
+    모인 페이지들을 한 번에 OCR 하여 page_texts 의 해당 index 에 텍스트를 채움
+
+    Parameters
+    ----------
+    window_pages : list[tuple[int, tuple[str, bytes]]]
+        (페이지 index, (페이지 이미지명, 이미지 바이트)) 리스트
+    page_texts : list[str]
+        문서의 페이지별 텍스트 리스트 (index 위치에 결과를 채움)
+    ocr_engine : cloud_vision.OcrEngine
+        run 동안 공유하는 OCR 엔진
+    batch_size : int
+        batch_annotate_images 한 요청에 묶을 이미지 수
+    my_logger : Logger
+        사용할 로깅 객체
+    full_text : bool
+        False 면 번호가 나왔는지 확인하여 반환
+    roi_template : RoiTemplate
+        번호 영역 템플릿, None 이면 전체 페이지를 OCR
+    mosaic_ocr : MosaicOcr
+        모자이크 OCR, None 이면 페이지마다 한 장씩 요청
+
+    Returns
+    -------
+    bool
+        full_text 가 아니고 사업자 등록 번호가 나와 남은 페이지를 생략해도 되는지 여부
+    """
+    if roi_template is not None:
+        window_texts = ocr_roi_pages(window_pages, ocr_engine, roi_template, batch_size, my_logger, mosaic_ocr)
+    else:
+        window_texts = []
+        detect_batch = mosaic_ocr.detect_batch if mosaic_ocr is not None else ocr_engine.detect_batch
+        ocr_results = detect_batch([page for _, page in window_pages], max_images=batch_size)
+        for (index, _), ocr_result in zip(window_pages, ocr_results):
+            if ocr_result.error is not None:
+                my_logger.error("OCR 실패: " + ocr_result.source + " -> {}".format(ocr_result.error))
+            window_texts.append((index, ocr_result.text))
+    for index, page_text in window_texts:
+        page_texts[index] = page_text
+    return not full_text and any(extract_bsn(page_text) is not None
+                                 for _, page_text in window_texts if page_text is not None)
+
+
+def extract_document_fields(doc: dict):
+    """
+    파이프라인 필드 추출 단계. 페이지마다 등록증 필드를 한 번의 탐색으로 추출하고,
+    필드별로 페이지 순서대로 처음 발견된 값을 문서에 담음
+    텍스트 레이어 단계에서 이미 찾은 사업자 등록 번호는 덮어쓰지 않으며, 등록증 탐색에서 번호가 나오지 않으면
+    페이지별 번호 추출로 한 번 더 찾음
+    """
+    values = dict.fromkeys(CertificateRecord._fields)
+    values['bsn'] = doc.get('bsn')
+    doc['bsn_page'] = None
+    for page_no, total_str in zip(doc['text_pages'], doc['texts']):
+        record = extract_certificate(total_str)
+        for field, value in record._asdict().items():
+            if values[field] is None:
+                values[field] = value
+        if doc['bsn_page'] is None and record.bsn is not None and record.bsn == values['bsn']:
+            doc['bsn_page'] = page_no
+        if doc['bsn_page'] is not None and all(value is not None for value in values.values()):
+            break
+    if doc['bsn_page'] is None:
+        for page_no, total_str in zip(doc['text_pages'], doc['texts']):
+            bsn = extract_bsn(total_str)
+            if bsn is not None and values['bsn'] in (None, bsn):
+                values['bsn'] = bsn
+                doc['bsn_page'] = page_no
+                break
+    doc['fields'] = CertificateRecord(**values)
+    doc['bsn'] = doc['fields'].bsn
+    return doc
+
+
+def inquire_document_status(doc: dict, hometax_client: HometaxClient, my_logger=None):
+    """
+    파이프라인 홈택스 조회 단계. 추출한 번호가 있을 때만 휴폐업 상태를 조회
+    같은 번호는 run 당 한 번만 (성공할 때까지), 캐시가 신선하면 홈택스 호출 없이 처리됨
+    조회에 실패해도 OCR/번호 추출 결과는 버리지 않도록 문서를 실패시키지 않고 'status_error' 에 원인을 담음
+    """
+    doc['status'] = [None, None]
+    doc['status_error'] = None
+    if doc['bsn'] is not None:
+        result = hometax_client.lookup(doc['bsn'])
+        if result.error is not None:
+            doc['status_error'] = result.error
+            if my_logger is not None:
+                my_logger.warning(doc['file'] + " 휴폐업 조회 실패 (" + doc['bsn'] + "): {}".format(result.error))
+            return doc
+        doc['status'] = [result.status, result.desc]
+    return doc
+
+
+def format_document_result(doc: dict, error: Exception = None):
+    """
+    문서 하나의 OCR 결과와 휴폐업 조회 결과를 결과 파일 형식의 문자열로 변환
+    장 번호는 결과 레코드의 page 와 같은 문서 내 원본 장 번호이며, 빈 페이지 등은 번호만 건너뜀
+    페이지 텍스트 중 장/문서 구분 줄과 같은 모양의 줄은 escape 하여 기록 (utils.utils_result.escape_result_text)
+    처리 도중 실패한 문서는 실패 전까지 채워진 값(OCR 텍스트, 번호 등)과 함께 error 줄을 기록
+
+    Parameters
+    ----------
+    doc : dict
+        파이프라인을 통과한 문서 객체 (실패했으면 실패한 단계 직전까지의 문서 객체)
+    error : Exception
+        문서를 실패시킨 예외, None 이면 휴폐업 조회 실패('status_error')만 기록
+
+    Returns
+    -------
+    str
+        결과 문자열
+    """
+    result_str = ""
+    for page_no, total_str in zip(doc.get('text_pages', []), doc.get('texts', [])):
+        result_str += str(page_no) + "번째 장:\n\n" + escape_result_text(total_str) + "\n\n"
+    status = doc.get('status', [None, None])
+    result_str += ("Img File: " + doc['file']
+                   + "\nBusiness Number: " + str(doc.get('bsn'))
+                   + "\nstatus: " + str(status[0])
+                   + "\ndesc: " + str(status[1]))
+    if error is None:
+        error = doc.get('status_error')
+    if error is not None:
+        result_str += "\nerror: " + str(error)
+    fields = doc.get('fields')
+    if fields is not None:
+        result_str += ("\nCompany Name: " + str(fields.company_name)
+                       + "\nRepresentative: " + str(fields.representative)
+                       + "\nOpening Date: " + str(fields.opening_date)
+                       + "\nBusiness Type: " + str(fields.business_type)
+                       + "\nBusiness Item: " + str(fields.business_item))
+    result_str += '\n\n'
+    return result_str
+
+
+def make_result_record(result):
+    """
+    파이프라인 결과 하나를 결과 저장소에 기록할 문서별 레코드로 변환
+    실패한 문서도 실패한 단계 직전까지 채워진 값(페이지 수, 번호, 등록증 필드 등)을 원인과 함께 기록
+
+    Parameters
+    ----------
+    result : pipeline.PipelineResult
+        문서 하나의 파이프라인 결과
+
+    Returns
+    -------
+    dict
+        utils.utils_result.RESULT_FIELDS 를 키로 갖는 레코드
+    """
+    record = dict.fromkeys(RESULT_FIELDS)
+    record['file'] = result.item['file']
+    record['timings'] = {stage: round(elapsed, 4) for stage, elapsed in result.timings.items()}
+    record['total_sec'] = round(sum(result.timings.values()), 4)
+    record['processed_at'] = time.time()
+    doc = result.value
+    record['pages'] = doc.get('page_count')
+    record['page'] = doc.get('bsn_page')
+    record['bsn'] = doc.get('bsn')
+    record['status'], record['desc'] = doc.get('status', [None, None])
+    if doc.get('fields') is not None:
+        for field, value in doc['fields']._asdict().items():
+            if field != 'bsn':
+                record[field] = value
+    if result.error is not None:
+        record['error'] = str(result.error)
+        record['error_stage'] = result.stage
+    elif doc.get('status_error') is not None:
+        record['error'] = str(doc['status_error'])
+        record['error_stage'] = 'inquire_status'
+    return record
 
 
 # ######################MAIN STREAM###################### #
@@ -93,7 +569,8 @@ if __name__ == '__main__':
     my_logger = create_logger("LOG")
     # *************CONFIG SETTING START*************
     # ini 파일을 읽어올 config 객체 생성
-    config_dict = get_configs(my_logger)["MAIN"]
+    configs = get_configs(my_logger)
+    config_dict = configs["MAIN"]
     # API 사용을 위한 인증 정보를 환경 변수에 설정
     # 그냥 환경변수에 설정하면 원인 모를 이유로 python 실행 시 가져오지 못함
     os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = ConfigBean.ABS_PATH + "\\" + config_dict['API_KEY']
@@ -104,8 +581,9 @@ if __name__ == '__main__':
     # 결과값 저장 경로
     result_path = DataBean.OUTPUT_ABS_PATH + "\\"
     # 이미지 전처리 결과 저장 경로
-    # preprocessed_path = img_path + "\\preprocessed_" + str(seq_num) + "\\"
-    preprocessed_path = img_path + "\\preprocessed_1618992408\\"
+    preprocessed_path = img_path + configs.get('RASTER', 'PREPROCESSED_DIR', fallback='preprocessed') + "\\"
+    # 입력 폴더를 감시하며 들어오는 문서를 바로 처리하는 서비스 모드 여부
+    watch_mode = '--watch' in sys.argv or configs.getboolean('WATCH', 'ENABLED', fallback=False)
 
     if not make_dir([img_path, result_path, preprocessed_path], my_logger):
         my_logger.error("프로세스 수행 필요 경로 생성 실패")
@@ -116,37 +594,203 @@ if __name__ == '__main__':
     # *************CONFIG SETTING END*************
     my_logger.info("Configuration 완료")
 
-    if not move_img(img_path, preprocessed_path, my_logger):
-        my_logger.error("이미지 전처리 실패")
-        sys.exit(-1)
-    my_logger.info("이미지 전처리 성공")
+    # 같은 이미지를 다시 처리할 때 API 호출 없이 재사용할 OCR 결과 캐시
+    ocr_cache = None
+    if configs.getboolean('OCR_CACHE', 'ENABLED', fallback=True):
+        ocr_cache = OcrCache(DataBean.OCR_CACHE_ABS_PATH,
+                             max_bytes=configs.getint('OCR_CACHE', 'MAX_MB', fallback=512) * 1024 * 1024,
+                             max_age=configs.getfloat('OCR_CACHE', 'MAX_AGE_DAYS', fallback=30) * 86400,
+                             my_logger=my_logger)
+    # 재스캔 등으로 바이트는 다르지만 거의 같은 페이지의 OCR 결과를 재사용하기 위한 perceptual hash 인덱스
+    phash_index = None
+    if configs.getboolean('PHASH', 'ENABLED', fallback=False):
+        phash_index = PhashIndex(DataBean.PHASH_INDEX_FILE,
+                                 hash_size=configs.getint('PHASH', 'HASH_SIZE', fallback=16),
+                                 max_distance=configs.getint('PHASH', 'MAX_DISTANCE', fallback=6),
+                                 my_logger=my_logger)
+    # 사업자 등록증의 번호 영역만 잘라 OCR 하기 위한 ROI 템플릿 (전체 페이지 OCR 결과로 영역을 학습)
+    # ROI 에서 번호를 찾은 페이지는 ROI 텍스트만 남으므로, 전문이 필요한 FULL_TEXT 에서는 사용하지 않음
+    full_text = configs.getboolean('OCR', 'FULL_TEXT', fallback=False)
+    roi_template = None
+    if configs.getboolean('ROI', 'ENABLED', fallback=False) and full_text:
+        my_logger.warning("FULL_TEXT 설정에서는 ROI OCR 을 사용하지 않습니다 (전체 페이지 OCR)")
+    elif configs.getboolean('ROI', 'ENABLED', fallback=False):
+        roi_template = RoiTemplate(tuple(float(value) for value in
+                                         configs.get('ROI', 'REGION', fallback='0.0,0.0,1.0,0.35').split(',')),
+                                   margin=configs.getfloat('ROI', 'MARGIN', fallback=0.03),
+                                   template_file=DataBean.ROI_TEMPLATE_FILE, my_logger=my_logger,
+                                   max_samples=configs.getint('ROI', 'MAX_SAMPLES', fallback=50))
+    # OCR 엔진은 run 당 한 번만 생성하여 클라이언트/채널을 재사용
+    ocr_engine = cloud_vision.OcrEngine(cloud_vision.create_backend(configs.get('OCR', 'BACKEND', fallback='vision')),
+                                        ocr_cache, phash_index)
+    # 작은 페이지/ROI 를 여러 장씩 한 캔버스로 묶어 요청 수를 줄이는 모자이크 OCR
+    mosaic_ocr = None
+    if configs.getboolean('MOSAIC', 'ENABLED', fallback=False):
+        mosaic_ocr = MosaicOcr(ocr_engine, max_tiles=configs.getint('MOSAIC', 'MAX_TILES', fallback=8),
+                               max_width=configs.getint('MOSAIC', 'MAX_WIDTH', fallback=2400),
+                               max_pixels=configs.getint('MOSAIC', 'MAX_PIXELS', fallback=8000000),
+                               gap=configs.getint('MOSAIC', 'GAP', fallback=40),
+                               max_wait=configs.getfloat('MOSAIC', 'MAX_WAIT', fallback=0.1),
+                               my_logger=my_logger)
 
-    # 경로 내 모든 이미지 파일 순회
-    result_str = ""
-    page_count = 1
-    for img_file in os.listdir(preprocessed_path):
-        # Google Cloud Vision에 요청하여 이미지를 텍스트로 변환
-        total_str = cloud_vision.detect_img_text(preprocessed_path + img_file)
-        # with io.open(result_path + img_file + '_result.txt', 'w', encoding="utf-8") as f:
-        #     f.write(total_str)
-        result_str += str(page_count) + "번째 장:\n\n" + total_str + "\n\n"
-        page_count += 1
-        # # 정규표현식을 사용해 텍스트 중 사업자 등록 번호 추출
-        # result_bsn = extract_bsn(total_str)
-        # # 홈택스에 사업자 등록번호를 이용해 휴폐업 상태 요청
-        # result_res = send_hometax(result_bsn)
-        # # 요청 결과값에서 상태와 설명만 추출
-        # result_status = extract_status(result_res)
-
-        # # 프로젝트 root 경로에 이미지 파일별 txt 생성
-        # result_str += ("Img File: " + img_file
-        #                + "\nBusiness Number: " + result_bsn
-        #                + "\nstatus: " + result_status[0]
-        #                + "\ndesc: " + result_status[1] + '\n\n')
-        #
-    # 결과값이 존재할 때만 만들 것
-    if len(result_str) > 0:
-        with io.open(result_path + 'total_result_' + str(seq_num) + '.txt', 'w', encoding="utf-8") as f:
-            f.write(result_str)
+    # 전처리 경로에 적재된 원본별 처리 이력 (크기, 수정 시각, 해시, 페이지 이미지)
+    ingest_manifest = IngestManifest(preprocessed_path + 'ingest_manifest.json', my_logger)
+    # pdf 를 OCR 목표 픽셀 수에 맞는 dpi 와 색상으로 한 번에 렌더링
+    render_profile = RenderProfile(configs.getint('RASTER', 'RENDER_TARGET_PIXELS', fallback=3000000),
+                                   configs.getboolean('RASTER', 'RENDER_GRAYSCALE', fallback=True),
+                                   configs.getint('RASTER', 'RENDER_THREADS', fallback=2),
+                                   configs.getint('OCR_PAYLOAD', 'QUALITY', fallback=80))
+    # 프로세스 풀 래스터화가 설정되어 있으면 pdf 를 여러 코어에서 미리 변환 (파이프라인은 변환된 이미지를 재사용)
+    raster_processes = configs.getint('RASTER', 'PROCESS_WORKERS', fallback=0)
+    if raster_processes > 1:
+        if not move_img(img_path, preprocessed_path, my_logger, workers=raster_processes,
+                        pages_per_task=configs.getint('RASTER', 'PAGES_PER_TASK', fallback=20),
+                        page_window=configs.getint('RASTER', 'PAGE_WINDOW', fallback=1),
+                        manifest=ingest_manifest, render_profile=render_profile):
+            my_logger.error("이미지 전처리 실패")
+            sys.exit(-1)
+        my_logger.info("이미지 전처리 성공")
+
+    # run 간 공유되는 사업자 번호별 휴폐업 상태 TTL 캐시
+    status_cache = None
+    if configs.getboolean('STATUS_CACHE', 'ENABLED', fallback=True):
+        status_cache = StatusCache(DataBean.STATUS_CACHE_FILE,
+                                   ttl=configs.getfloat('STATUS_CACHE', 'TTL_HOURS', fallback=24) * 3600,
+                                   max_entries=configs.getint('STATUS_CACHE', 'MAX_ENTRIES', fallback=100000),
+                                   my_logger=my_logger)
+    # 커넥션 풀을 유지하는 홈택스 클라이언트, 동시 요청 수와 요청별 타임아웃 적용
+    hometax_client = HometaxClient(max_in_flight=configs.getint('HOMETAX', 'MAX_IN_FLIGHT', fallback=4),
+                                   timeout=(configs.getfloat('HOMETAX', 'CONNECT_TIMEOUT', fallback=5.0),
+                                            configs.getfloat('HOMETAX', 'READ_TIMEOUT', fallback=15.0)),
+                                   status_cache=status_cache)
+
+    # 파이프라인 단계별 워커 수, 단계 사이 큐 크기
+    batch_size = configs.getint('OCR', 'BATCH_SIZE', fallback=cloud_vision.VISION_MAX_BATCH_IMAGES)
+    # 래스터화/빈 페이지 선별/최적화는 문서마다 페이지를 미리 준비하는 스레드에서 수행되므로
+    # 단계 워커 수 대신 여러 문서에 걸친 페이지 작업 동시 수행 수를 제한
+    page_prefetch = configs.getint('PIPELINE', 'PAGE_PREFETCH', fallback=1)
+    raster_slots = threading.BoundedSemaphore(configs.getint('PIPELINE', 'RASTER_WORKERS', fallback=1))
+    triage_slots = threading.BoundedSemaphore(configs.getint('PIPELINE', 'OPTIMIZE_WORKERS', fallback=2))
+    optimize_slots = threading.BoundedSemaphore(configs.getint('PIPELINE', 'OPTIMIZE_WORKERS', fallback=2))
+    pipeline = Pipeline([
+        Stage('text_layer', partial(read_text_layer, original_path=img_path,
+                                    min_chars=configs.getint('TEXT_LAYER', 'MIN_CHARS', fallback=20),
+                                    my_logger=my_logger),
+              configs.getint('PIPELINE', 'RASTER_WORKERS', fallback=1)),
+        Stage('rasterize', partial(rasterize_document, original_path=img_path, target_path=preprocessed_path,
+                                   my_logger=my_logger,
+                                   page_window=configs.getint('RASTER', 'PAGE_WINDOW', fallback=1),
+                                   in_memory=raster_processes <= 1,
+                                   save_preprocessed=configs.getboolean('RASTER', 'SAVE_PREPROCESSED',
+                                                                        fallback=False),
+                                   manifest=ingest_manifest, render_profile=render_profile,
+                                   prefetch=page_prefetch, limiter=raster_slots),
+              configs.getint('PIPELINE', 'RASTER_WORKERS', fallback=1)),
+        Stage('triage', partial(triage_document,
+                                ink_threshold=configs.getfloat('TRIAGE', 'INK_THRESHOLD', fallback=0.0001),
+                                std_threshold=configs.getfloat('TRIAGE', 'STD_THRESHOLD', fallback=1.0),
+                                my_logger=my_logger, prefetch=page_prefetch, limiter=triage_slots)),
+        Stage('optimize', partial(optimize_document,
+                                  max_pixels=configs.getint('OCR_PAYLOAD', 'MAX_PIXELS', fallback=3000000),
+                                  grayscale=configs.getboolean('OCR_PAYLOAD', 'GRAYSCALE', fallback=True),
+                                  quality=configs.getint('OCR_PAYLOAD', 'QUALITY', fallback=80),
+                                  my_logger=my_logger, prefetch=page_prefetch, limiter=optimize_slots)),
+        Stage('ocr', partial(ocr_document, ocr_engine=ocr_engine, batch_size=batch_size, my_logger=my_logger,
+                             full_text=full_text,
+                             page_window=configs.getint('OCR', 'EARLY_STOP_WINDOW', fallback=1),
+                             roi_template=roi_template, mosaic_ocr=mosaic_ocr),
+              configs.getint('PIPELINE', 'OCR_WORKERS', fallback=4)),
+        Stage('extract_fields', extract_document_fields),
+        Stage('inquire_status', partial(inquire_document_status, hometax_client=hometax_client, my_logger=my_logger),
+              configs.getint('PIPELINE', 'HOMETAX_WORKERS', fallback=4)),
+    ], queue_size=configs.getint('PIPELINE', 'QUEUE_SIZE', fallback=8), logger=my_logger,
+        max_in_flight=configs.getint('PIPELINE', 'MAX_IN_FLIGHT', fallback=16),
+        # 서비스 모드는 늦은 문서 하나가 다른 문서의 결과를 막지 않도록 끝나는 순서대로 기록
+        ordered=not watch_mode)
+
+    # 문서가 끝날 때마다 구조화된 결과 레코드를 바로 기록하는 결과 저장소
+    result_format = configs.get('RESULT', 'FORMAT', fallback='jsonl').lower()
+    result_sink = None
+    if result_format != 'none':
+        sink_kwargs = {}
+        if result_format == 'parquet':
+            sink_kwargs['row_group_size'] = configs.getint('RESULT', 'ROW_GROUP_SIZE', fallback=1000)
+        result_sink = create_sink(result_format, result_path + 'result_' + str(seq_num), my_logger, **sink_kwargs)
+
+    if watch_mode:
+        # 결과까지 낸 문서의 이력, 재시작 시 이미 처리한 문서는 건너뜀
+        watch_manifest = IngestManifest(result_path + 'watch_manifest.json', my_logger)
+        watcher = FolderWatcher(img_path, my_logger,
+                                interval=configs.getfloat('WATCH', 'INTERVAL', fallback=2.0),
+                                settle_time=configs.getfloat('WATCH', 'SETTLE_SECONDS', fallback=1.0),
+                                is_processed=watch_manifest.is_processed,
+                                retry_delay=configs.getfloat('WATCH', 'RETRY_SECONDS', fallback=60.0))
+        try:
+            # 문서가 끝나는 대로 문서별 결과 파일 작성
+            for result in pipeline.run({'file': filename} for filename in watcher.watch()):
+                if result_sink is not None:
+                    result_sink.write(make_result_record(result))
+                if result.error is not None:
+                    my_logger.error(result.item['file'] + " 처리 실패 [" + result.stage + "]: {}".format(result.error)
+                                    + ", 재시도 예정")
+                    watcher.retry(result.item['file'])
+                    continue
+                doc = result.value
+                with io.open(result_path + doc['file'] + '_result.txt', 'w', encoding="utf-8") as f:
+                    f.write(format_document_result(doc))
+                if doc.get('status_error') is not None:
+                    # 휴폐업 조회만 실패한 문서도 이력에 남기지 않고 다시 처리 (성공한 페이지 OCR 은 캐시로 재사용)
+                    watcher.retry(doc['file'])
+                    continue
+                watch_manifest.record(img_path + doc['file'], doc['page_names'])
+                watch_manifest.save()
+                my_logger.info(doc['file'] + " 처리 완료: " + str(doc['bsn']) + " / " + str(doc['status'][0]))
+        except KeyboardInterrupt:
+            watcher.stop()
+            my_logger.info("서비스 모드 종료 요청")
     else:
-        my_logger.error("이미지에서 추출된 텍스트가 없습니다")
+        # 경로 내 모든 파일을 파이프라인에 흘려보내고 입력 순서대로 끝나는 즉시 결과 기록
+        documents = [{'file': filename} for filename in os.listdir(img_path) if os.path.isfile(img_path + filename)]
+        # 결과값이 존재할 때만 만들 것 (첫 문서가 끝날 때 생성)
+        total_result = None
+        total_pages = 0
+        blank_pages = 0
+        try:
+            for result in pipeline.run(documents):
+                if result_sink is not None:
+                    result_sink.write(make_result_record(result))
+                if result.error is not None:
+                    my_logger.error(result.item['file'] + " 처리 실패 [" + result.stage + "]: {}".format(result.error))
+                # 실패한 문서도 실패 전까지의 OCR 텍스트/번호를 error 줄과 함께 남김
+                doc = result.value
+                if total_result is None:
+                    total_result = io.open(result_path + 'total_result_' + str(seq_num) + '.txt', 'w',
+                                           encoding="utf-8")
+                total_result.write(format_document_result(doc, result.error))
+                total_result.flush()
+                total_pages += len(doc.get('page_names', []))
+                blank_pages += len(doc.get('blank_pages', ()))
+        finally:
+            if total_result is not None:
+                total_result.close()
+        my_logger.info("이미지 처리 완료 (빈 페이지 제외 " + str(blank_pages) + "/" + str(total_pages) + "장)")
+
+        if total_result is None:
+            my_logger.error("이미지에서 추출된 텍스트가 없습니다")
+    if result_sink is not None:
+        result_sink.close()
+        my_logger.info("결과 레코드 " + str(result_sink.count) + "건 기록: " + result_sink.result_file)
+    if ocr_cache is not None:
+        my_logger.info("OCR 캐시 hit: " + str(ocr_cache.hits) + ", miss: " + str(ocr_cache.misses))
+    if phash_index is not None:
+        my_logger.info("근사 중복 페이지 재사용: " + str(phash_index.hits))
+        phash_index.close()
+    if roi_template is not None:
+        roi_template.save()
+    if mosaic_ocr is not None:
+        my_logger.info("모자이크 OCR: 캔버스 " + str(mosaic_ocr.mosaics) + "장에 " + str(mosaic_ocr.tiles) + "장 요청")
+    ocr_engine.close()
+    hometax_client.close()
+    ingest_manifest.save()
+    if status_cache is not None:
+        status_cache.save()
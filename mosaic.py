@@ -0,0 +1,243 @@
+# 표준 라이브러리
+import time
+import threading
+from logging import Logger
+from concurrent.futures import Future
+# 3rd party
+# 내부 패키지
+import cloud_vision
+from cloud_vision import OcrResult, VISION_MAX_BATCH_IMAGES, VISION_MAX_BATCH_BYTES
+from utils.utils_img import plan_mosaic, compose_mosaic, get_img_size
+
+
+def split_words(words: list, tiles: list):
+    """
+    캔버스 OCR 의 단어들을 중심점이 속한 타일별로 나누고 타일 기준 좌표로 옮김
+
+    Parameters
+    ----------
+    words : list[cloud_vision.OcrWord]
+        캔버스 좌표의 단어 리스트
+    tiles : list[tuple[int, int, int, int]]
+        타일별 캔버스 위 (left, top, right, bottom)
+
+    Returns
+    -------
+    list[list[cloud_vision.OcrWord]]
+        타일 순서대로의 단어 리스트, 어느 타일에도 속하지 않은 단어는 버림
+    """
+    tile_words = [[] for _ in tiles]
+    for word in words:
+        center_x = (word.box[0] + word.box[2]) / 2
+        center_y = (word.box[1] + word.box[3]) / 2
+        for tile_index, (left, top, right, bottom) in enumerate(tiles):
+            if left <= center_x < right and top <= center_y < bottom:
+                tile_words[tile_index].append(word._replace(box=(word.box[0] - left, word.box[1] - top,
+                                                                 word.box[2] - left, word.box[3] - top)))
+                break
+    return tile_words
+
+
+def words_to_text(words: list):
+    """
+    단어 위치로 줄을 묶어 텍스트 복원. 같은 줄에서 글자 높이 대비 충분히 떨어진 단어 사이에만 공백을 넣음
+    ('123', '-', '45-67890' 처럼 쪼개져 인식된 번호가 다시 이어지도록)
+
+    Parameters
+    ----------
+    words : list[cloud_vision.OcrWord]
+        한 타일의 단어 리스트
+
+    Returns
+    -------
+    str
+        줄바꿈으로 구분된 텍스트
+    """
+    lines = []
+    for word in sorted(words, key=lambda w: ((w.box[1] + w.box[3]) / 2, w.box[0])):
+        center_y = (word.box[1] + word.box[3]) / 2
+        line = lines[-1] if lines else None
+        if line is not None and abs(center_y - line['center_y']) <= line['height'] / 2:
+            line['words'].append(word)
+        else:
+            lines.append({'center_y': center_y, 'height': max(word.box[3] - word.box[1], 1), 'words': [word]})
+    text_lines = []
+    for line in lines:
+        line_str = ''
+        prev_right = None
+        for word in sorted(line['words'], key=lambda w: w.box[0]):
+            if prev_right is not None and word.box[0] - prev_right > line['height'] * 0.3:
+                line_str += ' '
+            line_str += word.text
+            prev_right = word.box[2]
+        text_lines.append(line_str)
+    return '\n'.join(text_lines)
+
+
+class MosaicOcr:
+    """
+    작은 페이지/ROI 여러 장을 한 캔버스에 타일로 배치하여 OCR 요청 한 건으로 보내는 모자이크 OCR
+    Vision 은 이미지 단위로 과금/요청 제한을 하므로, 캔버스의 단어 위치를 타일별로 되돌려 나누면
+    같은 요청 수로 여러 장을 처리할 수 있음. 동시에 호출한 OCR 워커들의 요청도 max_wait 동안 모아 한 캔버스에 담음
+
+    Attributes
+    ----------
+    engine : cloud_vision.OcrEngine
+        캔버스 OCR 및 단독 이미지 OCR 에 사용할 엔진
+    max_tiles : int
+        캔버스 하나에 담을 최대 이미지 수
+    max_width : int
+        캔버스 최대 너비
+    max_pixels : int
+        캔버스 최대 픽셀 수
+    gap : int
+        타일 사이 여백
+    max_wait : float
+        다른 워커의 요청을 기다릴 최대 시간 (초)
+    mosaics : int
+        보낸 캔버스 수
+    tiles : int
+        캔버스에 담아 보낸 이미지 수
+    """
+
+    def __init__(self, engine: cloud_vision.OcrEngine, max_tiles: int = 8, max_width: int = 2400,
+                 max_pixels: int = 8000000, gap: int = 40, max_wait: float = 0.1, quality: int = 85,
+                 my_logger: Logger = None):
+        self.engine = engine
+        self.max_tiles = max_tiles
+        self.max_width = max_width
+        self.max_pixels = max_pixels
+        self.gap = gap
+        self.max_wait = max_wait
+        self.quality = quality
+        self.logger = my_logger
+        self.mosaics = 0
+        self.tiles = 0
+        self._cond = threading.Condition()
+        # 아직 보내지 않은 (source, content, Future) 리스트
+        self._pending = []
+
+    def detect_batch(self, items: list, max_images: int = VISION_MAX_BATCH_IMAGES,
+                     max_bytes: int = VISION_MAX_BATCH_BYTES):
+        """
+        OcrEngine.detect_batch 와 같은 형태로 호출하는 모자이크 OCR
+        요청을 대기열에 넣고, 대기열이 max_tiles 만큼 차거나 max_wait 가 지나면 모인 요청을 한꺼번에 처리
+
+        Parameters
+        ----------
+        items : list[tuple[str, bytes]]
+            (원본 식별자, 인코딩된 이미지 바이트) 리스트
+        max_images : int
+            요청당 최대 이미지 수 (캔버스 수 기준)
+        max_bytes : int
+            요청당 최대 바이트 합계
+
+        Returns
+        -------
+        list[OcrResult]
+            입력 순서와 같은 결과 리스트
+        """
+        futures = [Future() for _ in items]
+        taken = []
+        with self._cond:
+            self._pending.extend((source, content, future) for (source, content), future in zip(items, futures))
+            deadline = time.monotonic() + self.max_wait
+            while len(self._pending) < self.max_tiles and not all(future.done() for future in futures):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            if not all(future.done() for future in futures):
+                taken = self._pending
+                self._pending = []
+        if taken:
+            self._flush(taken, max_images, max_bytes)
+        return [future.result() for future in futures]
+
+    def _flush(self, taken: list, max_images: int, max_bytes: int):
+        items = [(source, content) for source, content, _ in taken]
+        try:
+            results = self.detect_mosaic(items, max_images, max_bytes)
+        except Exception as e:
+            results = [OcrResult(source, None, e) for source, _ in items]
+        for (_, _, future), result in zip(taken, results):
+            future.set_result(result)
+        # 다른 워커가 대신 보낸 요청을 기다리던 워커가 max_wait 를 다 채우지 않고 바로 돌아가도록 깨움
+        # (대기열이 max_tiles 만큼 차는 경우는 채운 워커가 락을 쥔 채 바로 가져가므로 여기서만 알리면 됨)
+        with self._cond:
+            self._cond.notify_all()
+
+    def detect_mosaic(self, items: list, max_images: int = VISION_MAX_BATCH_IMAGES,
+                      max_bytes: int = VISION_MAX_BATCH_BYTES):
+        """
+        (식별자, 이미지 바이트) 리스트를 캔버스로 묶어 OCR 하고 결과를 타일별로 나눔
+        캐시에 있는 이미지는 제외하고, 캔버스에 혼자 남은 이미지는 원본 그대로 일반 배치 OCR 로 보냄
+        타일 단어로 복원한 텍스트는 전체 이미지 OCR 결과와 다르므로 캐시는 '|mosaic' 을 붙인 별도 설정 키로 조회/저장
+
+        Parameters
+        ----------
+        items : list[tuple[str, bytes]]
+            (원본 식별자, 인코딩된 이미지 바이트) 리스트
+        max_images : int
+            요청당 최대 캔버스 수
+        max_bytes : int
+            요청당 최대 바이트 합계
+
+        Returns
+        -------
+        list[OcrResult]
+            입력 순서와 같은 결과 리스트
+        """
+        cache = self.engine.cache
+        settings_key = self.engine.backend.settings_key() + '|mosaic'
+        results = [None] * len(items)
+        missed = []
+        for index, (source, content) in enumerate(items):
+            text = cache.get(content, settings_key) if cache is not None else None
+            if text is None:
+                missed.append(index)
+            else:
+                results[index] = OcrResult(source, text, None)
+
+        plans = plan_mosaic([get_img_size(items[index][1]) for index in missed], self.max_width, self.max_pixels,
+                            self.max_tiles, self.gap)
+        singles = []
+        canvases = []
+        for plan_indexes, positions, canvas_size in plans:
+            indexes = [missed[position] for position in plan_indexes]
+            if len(indexes) == 1:
+                singles.append(indexes[0])
+                continue
+            content = compose_mosaic([items[index][1] for index in indexes], positions, canvas_size, self.quality)
+            tiles = []
+            for index, (x, y) in zip(indexes, positions):
+                width, height = get_img_size(items[index][1])
+                tiles.append((x, y, x + width, y + height))
+            canvases.append((indexes, tiles, content))
+
+        for batch in cloud_vision.plan_batches([len(content) for _, _, content in canvases], max_images, max_bytes):
+            try:
+                batch_results = self.engine.backend.detect_layout_batch([canvases[position][2]
+                                                                         for position in batch])
+            except Exception as e:
+                batch_results = [(None, None, e)] * len(batch)
+            for position, (_, words, error) in zip(batch, batch_results):
+                indexes, tiles, _ = canvases[position]
+                if error is not None:
+                    for index in indexes:
+                        results[index] = OcrResult(items[index][0], None, error)
+                    continue
+                for index, tile_words in zip(indexes, split_words(words, tiles)):
+                    text = words_to_text(tile_words)
+                    results[index] = OcrResult(items[index][0], text, None)
+                    if cache is not None:
+                        cache.put(items[index][1], settings_key, text)
+            with self._cond:
+                self.mosaics += len(batch)
+                self.tiles += sum(len(canvases[position][0]) for position in batch)
+
+        if singles:
+            for index, result in zip(singles, self.engine.detect_batch([items[index] for index in singles],
+                                                                       max_images, max_bytes)):
+                results[index] = result
+        return results
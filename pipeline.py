@@ -0,0 +1,236 @@
+# 표준 라이브러리
+import time
+import queue
+import threading
+from logging import Logger
+from collections import namedtuple
+# 3rd party
+# 내부 패키지
+
+# 파이프라인 최종 결과. item 은 입력 원본, value 는 마지막으로 성공한 단계의 결과, 실패 시 error/stage 에 원인이 담김
+# timings 는 {단계명: 소요 시간(초)}
+PipelineResult = namedtuple('PipelineResult', ['item', 'value', 'error', 'stage', 'timings'])
+
+# 단계 간 종료 신호
+_SENTINEL = object()
+
+
+class Stage:
+    """
+    파이프라인을 구성하는 한 단계. 이전 단계의 결과를 받아 func 를 적용한 값을 다음 단계로 넘김
+
+    Attributes
+    ----------
+    name : str
+        로그/에러 표시용 단계명
+    func : callable
+        값 하나를 받아 다음 단계로 넘길 값을 반환하는 함수
+    workers : int
+        이 단계를 동시에 수행할 스레드 수
+    """
+
+    def __init__(self, name: str, func, workers: int = 1):
+        if workers < 1:
+            raise ValueError('workers 는 1 이상이어야 합니다: {} = {}'.format(name, workers))
+        self.name = name
+        self.func = func
+        self.workers = workers
+
+
+class Pipeline:
+    """
+    단계별 워커 스레드와 크기 제한 큐로 구성된 producer/consumer 파이프라인.
+    래스터화, OCR, 홈택스 조회처럼 대기 시간이 긴 단계를 서로 겹쳐 수행하되 결과는 입력 순서대로 돌려줌
+    (ordered 가 아니면 끝나는 순서대로 돌려줌)
+
+    Attributes
+    ----------
+    stages : list[Stage]
+        순서대로 적용할 단계 리스트
+    queue_size : int
+        단계 사이 큐의 최대 크기
+    max_in_flight : int
+        투입되었지만 아직 내보내지 않은 항목 수 상한 (재정렬 버퍼 포함, 메모리 상한 역할)
+        None 이면 queue_size 와 전체 워커 수의 합
+    ordered : bool
+        True 면 입력 순서대로, False 면 완료 순서대로 결과를 내보냄
+    logger : Logger
+        사용할 로깅 객체
+    """
+
+    def __init__(self, stages: list, queue_size: int = 8, logger: Logger = None, max_in_flight: int = None,
+                 ordered: bool = True):
+        if len(stages) == 0:
+            raise ValueError('파이프라인에는 최소 한 개의 단계가 필요합니다')
+        if max_in_flight is None:
+            max_in_flight = queue_size + sum(stage.workers for stage in stages)
+        if max_in_flight < 1:
+            raise ValueError('max_in_flight 는 1 이상이어야 합니다: {}'.format(max_in_flight))
+        self.stages = stages
+        self.queue_size = queue_size
+        self.max_in_flight = max_in_flight
+        self.ordered = ordered
+        self.logger = logger
+
+    def run(self, items):
+        """
+        입력을 파이프라인에 흘려보내고 결과를 입력 순서대로 반환하는 generator
+
+        Parameters
+        ----------
+        items : iterable
+            첫 단계에 넣을 입력값들
+
+        Returns
+        -------
+        generator[PipelineResult]
+            입력 순서와 같은 순서의 결과 (ordered 가 아니면 완료 순서)
+        """
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+        # 앞 항목 하나가 늦어져도 뒤 항목이 재정렬 버퍼에 무한정 쌓이지 않도록 내보낼 때 반환하는 투입 허가
+        in_flight = threading.BoundedSemaphore(self.max_in_flight)
+        threads = [threading.Thread(target=self._feed, args=(items, queues[0], in_flight), daemon=True)]
+        for index, stage in enumerate(self.stages):
+            # 단계의 마지막 워커가 끝날 때 다음 단계로 종료 신호를 넘기기 위한 카운터
+            remaining = [stage.workers]
+            lock = threading.Lock()
+            next_workers = self.stages[index + 1].workers if index + 1 < len(self.stages) else 1
+            for _ in range(stage.workers):
+                threads.append(threading.Thread(target=self._work,
+                                                args=(stage, queues[index], queues[index + 1],
+                                                      remaining, lock, next_workers),
+                                                daemon=True))
+        for thread in threads:
+            thread.start()
+
+        # 완료 순서와 무관하게 입력 순서대로 내보내기 위한 재정렬 버퍼
+        pending = {}
+        next_seq = 0
+        output = queues[-1]
+        while True:
+            packet = output.get()
+            if packet is _SENTINEL:
+                break
+            if not self.ordered:
+                in_flight.release()
+                yield packet[1]
+                continue
+            pending[packet[0]] = packet[1]
+            while next_seq in pending:
+                in_flight.release()
+                yield pending.pop(next_seq)
+                next_seq += 1
+        for thread in threads:
+            thread.join()
+
+    def _feed(self, items, out_queue: queue.Queue, in_flight: threading.BoundedSemaphore):
+        try:
+            for seq, item in enumerate(items):
+                in_flight.acquire()
+                out_queue.put((seq, PipelineResult(item, item, None, None, {})))
+        finally:
+            for _ in range(self.stages[0].workers):
+                out_queue.put(_SENTINEL)
+
+    def _work(self, stage: Stage, in_queue: queue.Queue, out_queue: queue.Queue,
+              remaining: list, lock: threading.Lock, next_workers: int):
+        while True:
+            packet = in_queue.get()
+            if packet is _SENTINEL:
+                break
+            seq, result = packet
+            # 앞 단계에서 실패한 항목은 그대로 흘려보냄
+            if result.error is None:
+                start = time.perf_counter()
+                try:
+                    result = result._replace(value=stage.func(result.value))
+                except Exception as e:
+                    if self.logger is not None:
+                        self.logger.error("파이프라인 [" + stage.name + "] 단계 실패: " + str(result.item)
+                                          + " -> {}".format(e))
+                    result = result._replace(error=e, stage=stage.name)
+                result.timings[stage.name] = time.perf_counter() - start
+            out_queue.put((seq, result))
+        with lock:
+            remaining[0] -= 1
+            is_last = remaining[0] == 0
+        if is_last:
+            for _ in range(next_workers):
+                out_queue.put(_SENTINEL)
+
+
+class Prefetcher:
+    """
+    iterator 의 다음 항목을 전용 스레드에서 미리 꺼내 크기 제한 큐에 담아 두는 iterator.
+    파이프라인 단계가 문서의 페이지를 끝까지 만들어 두지 않고도, 뒤 단계가 앞 페이지를 처리하는 동안
+    다음 페이지를 준비하도록 함 (문서당 메모리는 size 장으로 제한)
+
+    Attributes
+    ----------
+    size : int
+        미리 꺼내 둘 항목 수 상한
+    limiter : threading.Semaphore
+        항목 하나를 꺼내는 동안 잡는 허가, 여러 문서의 같은 작업 동시 수행 수를 제한. None 이면 제한 없음
+    """
+
+    def __init__(self, items, size: int = 1, limiter: threading.Semaphore = None):
+        if size < 1:
+            raise ValueError('size 는 1 이상이어야 합니다: {}'.format(size))
+        self.size = size
+        self.limiter = limiter
+        self._queue = queue.Queue(maxsize=size)
+        self._stop = threading.Event()
+        self._done = False
+        self._thread = threading.Thread(target=self._fill, args=(items,), daemon=True)
+        self._thread.start()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._done:
+            raise StopIteration
+        error, item = self._queue.get()
+        if error is not None:
+            self._done = True
+            raise error
+        if item is _SENTINEL:
+            self._done = True
+            raise StopIteration
+        return item
+
+    def close(self):
+        """
+        더 이상 항목을 요청하지 않음. 준비 중인 항목까지만 만들고 원본 iterator 를 닫은 뒤 반환
+        """
+        self._done = True
+        self._stop.set()
+        self._thread.join()
+
+    def _fill(self, items):
+        items = iter(items)
+        try:
+            while not self._stop.is_set():
+                if self.limiter is not None:
+                    with self.limiter:
+                        item = next(items, _SENTINEL)
+                else:
+                    item = next(items, _SENTINEL)
+                if not self._put((None, item)) or item is _SENTINEL:
+                    break
+        except Exception as e:
+            self._put((e, None))
+        finally:
+            # 원본 generator 는 이 스레드에서만 진행되므로 닫는 것도 이 스레드에서 수행
+            if hasattr(items, 'close'):
+                items.close()
+
+    def _put(self, packet):
+        # 소비자가 close 하면 빈 자리를 기다리지 않고 중단
+        while not self._stop.is_set():
+            try:
+                self._queue.put(packet, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
@@ -0,0 +1,21 @@
+# 표준 라이브러리
+# 3rd party
+# 내부 패키지
+from extractor import extract_bsn, extract_certificate
+
+
+def test_extract_bsn_normalizes_ocr_noise():
+    assert extract_bsn('등록번호 : 124-8l-OO998') == '124-81-00998'
+
+
+def test_company_name_containing_keyword_is_kept_whole():
+    record = extract_certificate('상 호 : 가나다 사업자 주식회사\n등록번호 : 124-81-00998')
+    assert record.company_name == '가나다 사업자 주식회사'
+    assert record.bsn == '124-81-00998'
+
+
+def test_value_stops_before_bsn_label_and_candidate():
+    record = extract_certificate('상호 : 가나다상사 사업자등록번호 : 124-81-00998\n대표자 : 홍길동 124-81-00998')
+    assert record.company_name == '가나다상사'
+    assert record.representative == '홍길동'
+    assert record.bsn == '124-81-00998'
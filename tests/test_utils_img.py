@@ -0,0 +1,39 @@
+# 표준 라이브러리
+from io import BytesIO
+# 3rd party
+import numpy as np
+from PIL import Image, ImageDraw
+# 내부 패키지
+from utils.utils_img import is_blank_page
+
+
+def _encode(img: Image.Image):
+    buffer = BytesIO()
+    img.save(buffer, 'JPEG', quality=80)
+    return buffer.getvalue()
+
+
+def _sparse_page():
+    # A4 를 약 300만 픽셀로 렌더링한 크기에 번호 한 줄만 있는 페이지
+    img = Image.new('L', (1450, 2050), 255)
+    ImageDraw.Draw(img).text((150, 300), '124-81-00998', fill=0)
+    return _encode(img)
+
+
+def test_sparse_page_with_one_line_is_not_blank():
+    is_blank, ink_ratio, std = is_blank_page(_sparse_page())
+    # 잉크 비율/표준편차가 모두 낮은 페이지여야 회귀 확인이 의미 있음
+    assert ink_ratio < 0.001 and std < 3.0
+    assert not is_blank
+
+
+def test_low_ink_alone_does_not_make_page_blank(monkeypatch):
+    # 리뷰에서 측정한 번호 한 줄 페이지의 값 (ink=0.00029, std=1.53)
+    monkeypatch.setattr('utils.utils_img.get_ink_stats', lambda content: (0.00029, 1.53))
+    assert not is_blank_page(b'')[0]
+
+
+def test_blank_scan_is_blank():
+    noise = np.random.default_rng(0).normal(0, 2, (2050, 1450))
+    content = _encode(Image.fromarray(np.clip(235 + noise, 0, 255).astype(np.uint8)))
+    assert is_blank_page(content)[0]
@@ -0,0 +1,298 @@
+# 표준 라이브러리
+import os
+import io
+import time
+import json
+import hashlib
+import threading
+from logging import Logger
+# 3rd party
+# 내부 패키지
+
+
+class OcrCache:
+    """
+    이미지 바이트 + OCR 설정의 해시를 키로 OCR 결과 텍스트를 디스크에 저장하는 content-addressed 캐시
+    동일한 이미지를 다시 처리할 때 API 호출 없이 이전 결과를 재사용하기 위함
+
+    Attributes
+    ----------
+    cache_dir : str
+        캐시 파일을 적재할 경로
+    max_bytes : int
+        캐시 전체 크기 상한, 초과 시 가장 오래 사용되지 않은 항목부터 삭제
+    max_age : float
+        마지막 사용 후 보관할 최대 시간 (초), 0 이하면 무제한
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 512 * 1024 * 1024, max_age: float = 0,
+                 my_logger: Logger = None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.logger = my_logger
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._total_bytes = sum(size for _, _, size in self._entries())
+
+    @staticmethod
+    def make_key(content: bytes, settings: str):
+        """
+        이미지 바이트와 OCR 설정 문자열로 캐시 키 생성
+
+        Parameters
+        ----------
+        content : bytes
+            인코딩된 이미지 바이트
+        settings : str
+            결과에 영향을 주는 OCR 설정 (백엔드, 언어 등)
+
+        Returns
+        -------
+        str
+            sha256 hex 키
+        """
+        digest = hashlib.sha256(settings.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(content)
+        return digest.hexdigest()
+
+    def _path(self, key: str):
+        # 한 폴더에 파일이 몰리지 않도록 앞 2자리로 하위 폴더 분산
+        return os.path.join(self.cache_dir, key[:2], key + '.txt')
+
+    def _entries(self):
+        for sub_dir in os.listdir(self.cache_dir):
+            sub_path = os.path.join(self.cache_dir, sub_dir)
+            if not os.path.isdir(sub_path):
+                continue
+            for cache_file in os.listdir(sub_path):
+                cache_path = os.path.join(sub_path, cache_file)
+                try:
+                    stat = os.stat(cache_path)
+                except OSError:
+                    continue
+                yield cache_path, stat.st_mtime, stat.st_size
+
+    def get(self, content: bytes, settings: str):
+        """
+        캐시된 OCR 결과 조회, 조회된 항목은 사용 시각을 갱신하여 LRU 순서를 유지
+
+        Parameters
+        ----------
+        content : bytes
+            인코딩된 이미지 바이트
+        settings : str
+            OCR 설정 문자열
+
+        Returns
+        -------
+        str
+            캐시된 텍스트, 없거나 만료되었으면 None
+        """
+        cache_path = self._path(self.make_key(content, settings))
+        try:
+            mtime = os.path.getmtime(cache_path)
+            if self.max_age > 0 and time.time() - mtime > self.max_age:
+                self._remove(cache_path)
+                self.misses += 1
+                return None
+            with io.open(cache_path, 'r', encoding='utf-8') as f:
+                text = f.read()
+            os.utime(cache_path, None)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return text
+
+    def put(self, content: bytes, settings: str, text: str):
+        """
+        OCR 결과 저장, 크기 상한을 넘으면 오래된 항목부터 정리
+
+        Parameters
+        ----------
+        content : bytes
+            인코딩된 이미지 바이트
+        settings : str
+            OCR 설정 문자열
+        text : str
+            저장할 OCR 결과 텍스트
+        """
+        cache_path = self._path(self.make_key(content, settings))
+        data = text.encode('utf-8')
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            # 동시에 같은 키를 쓰더라도 깨진 파일이 보이지 않도록 임시 파일에 쓴 뒤 교체
+            tmp_path = cache_path + '.' + str(threading.get_ident()) + '.tmp'
+            with io.open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, cache_path)
+        except OSError as ex:
+            if self.logger is not None:
+                self.logger.warning("OCR 캐시 저장 실패: " + cache_path + " -> {}".format(ex))
+            return
+        with self._lock:
+            self._total_bytes += len(data)
+            over_limit = self._total_bytes > self.max_bytes
+        if over_limit:
+            self.evict()
+
+    def _remove(self, cache_path: str):
+        try:
+            size = os.path.getsize(cache_path)
+            os.remove(cache_path)
+        except OSError:
+            return
+        with self._lock:
+            self._total_bytes -= size
+
+    def evict(self):
+        """
+        만료된 항목을 지우고, 크기 상한의 90% 이하가 될 때까지 가장 오래 사용되지 않은 항목부터 삭제
+
+        Returns
+        -------
+        int
+            삭제한 항목 수
+        """
+        now = time.time()
+        removed = 0
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        total = sum(size for _, _, size in entries)
+        target = self.max_bytes * 0.9
+        for cache_path, mtime, size in entries:
+            expired = self.max_age > 0 and now - mtime > self.max_age
+            if not expired and total <= target:
+                break
+            try:
+                os.remove(cache_path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        with self._lock:
+            self._total_bytes = total
+        if removed > 0 and self.logger is not None:
+            self.logger.info("OCR 캐시 정리: " + str(removed) + "건 삭제")
+        return removed
+
+
+class StatusCache:
+    """
+    사업자 등록 번호별 휴폐업 조회 결과를 조회 시각과 함께 json 파일로 보관하는 TTL 캐시
+    신선도 기간 안의 재조회는 홈택스 호출 없이 캐시 값을 사용하기 위함
+
+    Attributes
+    ----------
+    cache_file : str
+        캐시를 저장할 json 파일 경로
+    ttl : float
+        조회 결과의 유효 기간 (초)
+    max_entries : int
+        보관할 최대 항목 수, 초과 시 가장 오래 전에 조회한 항목부터 삭제
+    """
+
+    def __init__(self, cache_file: str, ttl: float = 86400, max_entries: int = 100000, my_logger: Logger = None):
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.logger = my_logger
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._dirty = False
+        self.load()
+
+    def load(self):
+        """
+        캐시 파일을 읽어 메모리에 적재, 파일이 없거나 깨졌으면 빈 캐시로 시작
+        """
+        if not os.path.isfile(self.cache_file):
+            return
+        try:
+            with io.open(self.cache_file, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as ex:
+            if self.logger is not None:
+                self.logger.warning("상태 캐시 로드 실패, 빈 캐시로 시작: " + self.cache_file + " -> {}".format(ex))
+            return
+        with self._lock:
+            self._entries = {bsn: tuple(entry) for bsn, entry in entries.items()}
+
+    def get(self, bsn: str):
+        """
+        신선도 기간 안의 조회 결과 반환
+
+        Parameters
+        ----------
+        bsn : str
+            사업자 등록 번호
+
+        Returns
+        -------
+        tuple[str, str, float]
+            (status, desc, fetched_at), 없거나 만료되었으면 None
+        """
+        with self._lock:
+            entry = self._entries.get(bsn)
+        if entry is None or time.time() - entry[2] > self.ttl:
+            return None
+        return entry
+
+    def put(self, bsn: str, status: str, desc: str, fetched_at: float = None):
+        """
+        조회 결과 저장, 최대 항목 수를 넘으면 오래된 항목부터 삭제
+
+        Parameters
+        ----------
+        bsn : str
+            사업자 등록 번호
+        status : str
+            휴폐업 상태
+        desc : str
+            상태 설명
+        fetched_at : float
+            조회 시각 (epoch 초), 없으면 현재 시각
+        """
+        with self._lock:
+            self._entries[bsn] = (status, desc, fetched_at if fetched_at is not None else time.time())
+            self._dirty = True
+            if len(self._entries) > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        # 만료된 항목을 먼저 지우고, 그래도 넘치면 상한의 90% 가 될 때까지 조회 시각이 오래된 순으로 삭제
+        now = time.time()
+        for bsn in [bsn for bsn, entry in self._entries.items() if now - entry[2] > self.ttl]:
+            del self._entries[bsn]
+        overflow = len(self._entries) - int(self.max_entries * 0.9)
+        if overflow > 0:
+            for bsn, _ in sorted(self._entries.items(), key=lambda item: item[1][2])[:overflow]:
+                del self._entries[bsn]
+
+    def save(self):
+        """
+        변경 사항이 있을 때만 캐시를 json 파일로 저장
+
+        Returns
+        -------
+        bool
+            저장 성공 여부
+        """
+        with self._lock:
+            if not self._dirty:
+                return True
+            entries = dict(self._entries)
+            self._dirty = False
+        tmp_file = self.cache_file + '.tmp'
+        try:
+            with io.open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(entries, f, ensure_ascii=False)
+            os.replace(tmp_file, self.cache_file)
+        except OSError as ex:
+            if self.logger is not None:
+                self.logger.error("상태 캐시 저장 실패: " + self.cache_file + " -> {}".format(ex))
+            return False
+        return True
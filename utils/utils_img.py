@@ -1,16 +1,26 @@
 # 표준 라이브러리
 import os
+import math
 from io import BytesIO
 import traceback
 from logging import Logger
 import shutil
+import tempfile
+import subprocess
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 # 3rd party
 from PIL import Image
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, pdfinfo_from_path
 import numpy as np
 import requests
 # 내부 패키지
 from utils.utils_io import is_duplicated
+from utils.utils_manifest import IngestManifest, STATE_UNCHANGED, STATE_CHANGED
+
+# pdf 렌더링 설정. target_pixels 는 페이지당 목표 픽셀 수 (0 이면 기본 dpi), thread_count 는 poppler 렌더링 스레드 수,
+# quality 는 메모리에서 바로 OCR 로 넘길 페이지의 JPEG 인코딩 품질 (OCR 업로드 품질과 같게 두면 다시 인코딩하지 않음)
+RenderProfile = namedtuple('RenderProfile', ['target_pixels', 'grayscale', 'thread_count', 'quality'])
 
 
 def is_img(target_file: str, logger: Logger):
@@ -40,6 +50,191 @@ def is_img(target_file: str, logger: Logger):
     return False
 
 
+class ImageChain:
+    """
+    이미지 편집 연산을 기록해 두었다가 한 번의 디코딩/인코딩으로 실행하는 지연 실행 파이프라인
+    연산마다 파일을 열고 저장하지 않고, 디코딩한 픽셀 배열 하나에 슬라이스(view) 로 연산을 이어 적용함
+
+    >>> ImageChain('a.png', logger).crop(1.0, 0.5).crop_row(0, 40).resize(800, 600).save('b.png')
+
+    Attributes
+    ----------
+    source_file : str
+        원본 이미지 파일명, 경로 (바이트로 만든 경우엔 식별용 이름)
+    content : bytes
+        파일 대신 사용할 인코딩된 이미지 바이트, None 이면 source_file 을 읽음
+    operations : list[tuple]
+        (연산명, 인자 tuple) 로 기록된 연산 목록
+    """
+
+    # 원본 함수와 동일하게 RGBA 로 맞춘 뒤 수행하는 연산
+    _RGBA_OPERATIONS = ('crop_row', 'crop_col', 'merge')
+
+    def __init__(self, source_file: str, my_logger: Logger, content: bytes = None):
+        self.source_file = source_file
+        self.logger = my_logger
+        self.content = content
+        self.operations = []
+
+    @classmethod
+    def from_bytes(cls, content: bytes, my_logger: Logger, name: str = '<bytes>'):
+        """
+        파일 대신 메모리의 이미지 바이트로 체인 생성
+        """
+        return cls(name, my_logger, content)
+
+    def crop(self, x_rate: float, y_rate: float):
+        """
+        x, y 비율만큼 좌상단 영역만 남김
+        """
+        self.operations.append(('crop', (x_rate, y_rate)))
+        return self
+
+    def crop_box(self, left: float, top: float, right: float, bottom: float):
+        """
+        (left, top, right, bottom) 비율 영역만 남김
+        """
+        self.operations.append(('crop_box', (left, top, right, bottom)))
+        return self
+
+    def crop_row(self, y1: int, y2: int):
+        """
+        y1 - y2 행 영역을 잘라냄
+        """
+        self.operations.append(('crop_row', (y1, y2)))
+        return self
+
+    def crop_col(self, x1: int, x2: int):
+        """
+        x1 - x2 열 영역을 잘라냄
+        """
+        self.operations.append(('crop_col', (x1, x2)))
+        return self
+
+    def merge(self, overlap_file: str, x_offset: int = 0, y_offset: int = 0):
+        """
+        overlap_file 을 x, y offset 에 맞추어 덮어씀
+        """
+        self.operations.append(('merge', (overlap_file, x_offset, y_offset)))
+        return self
+
+    def resize(self, width: int, height: int):
+        """
+        지정된 너비/높이로 리사이즈
+        """
+        self.operations.append(('resize', (width, height)))
+        return self
+
+    @staticmethod
+    def _remove_range(arr: np.ndarray, start: int, end: int, axis: int):
+        # 잘라낼 구간이 가장자리면 슬라이스 view 만으로 처리하고, 가운데일 때만 앞뒤를 한 번 이어 붙임
+        length = arr.shape[axis]
+        start = max(start, 0)
+        end = min(end, length)
+        if start >= end:
+            return arr
+        head = arr[:start] if axis == 0 else arr[:, :start]
+        tail = arr[end:] if axis == 0 else arr[:, end:]
+        if start == 0:
+            return tail
+        if end == length:
+            return head
+        return np.concatenate((head, tail), axis=axis)
+
+    def run(self):
+        """
+        원본을 한 번 디코딩하여 기록된 연산을 차례로 적용
+
+        Returns
+        -------
+        PIL.Image.Image
+            연산이 적용된 이미지 객체, 원본이 이미지가 아니면 None
+        """
+        if self.content is None and not is_img(self.source_file, self.logger):
+            return None
+        with Image.open(self.source_file if self.content is None else BytesIO(self.content)) as src_img:
+            src_img.load()
+            if any(operation in self._RGBA_OPERATIONS for operation, _ in self.operations):
+                src_img = src_img.convert('RGBA')
+            elif src_img.mode in ('P', 'PA'):
+                # 팔레트 이미지는 배열로 바꾸면 색상 index 만 남아 흑백으로 저장되므로 실제 색상으로 변환
+                src_img = src_img.convert('RGBA' if src_img.mode == 'PA' or 'transparency' in src_img.info
+                                          else 'RGB')
+            arr = np.asarray(src_img)
+
+        for operation, args in self.operations:
+            if operation == 'crop':
+                x_rate, y_rate = args
+                arr = arr[0:int(arr.shape[0] * y_rate), 0:int(arr.shape[1] * x_rate)]
+            elif operation == 'crop_box':
+                left, top, right, bottom = args
+                height, width = arr.shape[:2]
+                arr = arr[int(height * top):int(height * bottom), int(width * left):int(width * right)]
+            elif operation == 'crop_row':
+                arr = self._remove_range(arr, args[0], args[1], axis=0)
+            elif operation == 'crop_col':
+                arr = self._remove_range(arr, args[0], args[1], axis=1)
+            elif operation == 'merge':
+                overlap_file, x_offset, y_offset = args
+                if not is_img(overlap_file, self.logger):
+                    return None
+                source_img = Image.fromarray(arr)
+                with Image.open(overlap_file) as overlap_img:
+                    overlap_img = overlap_img.convert('RGBA')
+                canvas = Image.new('RGBA', source_img.size)
+                canvas.paste(source_img, (0, 0), source_img)
+                canvas.paste(overlap_img, (x_offset, y_offset), overlap_img)
+                arr = np.asarray(canvas)
+            elif operation == 'resize':
+                arr = np.asarray(Image.fromarray(arr).resize(args))
+        return Image.fromarray(np.ascontiguousarray(arr))
+
+    def save(self, save_file: str = None, img_format: str = None, quality: int = 95):
+        """
+        연산을 실행하고 결과를 한 번만 인코딩하여 저장
+
+        Parameters
+        ----------
+        save_file : str
+            저장할 이미지 파일명, 경로 (없으면 원본에 덮어씀)
+        img_format : str
+            저장 포맷, 없으면 확장자로 판단
+        quality : int
+            JPEG 품질
+
+        Returns
+        -------
+        bool
+            저장 성공 여부
+        """
+        if save_file is None:
+            save_file = self.source_file
+        try:
+            img = self.run()
+            if img is None:
+                return False
+            if (img_format or os.path.splitext(save_file)[1].lstrip('.')).upper() in ['JPEG', 'JPG'] \
+                    and img.mode not in ['RGB', 'L']:
+                img = img.convert('RGB')
+            img.save(save_file, img_format, quality=quality)
+        except Exception as e:
+            self.logger.error("이미지 연산 실패: " + self.source_file + " -> {}".format(e))
+            return False
+        return is_img(save_file, self.logger)
+
+    def to_bytes(self, img_format: str = 'JPEG', quality: int = 95):
+        """
+        연산을 실행하고 결과를 파일 대신 메모리 버퍼에 인코딩
+
+        Returns
+        -------
+        bytes
+            인코딩된 이미지 바이트, 실패 시 None
+        """
+        img = self.run()
+        return encode_img(img, img_format, quality) if img is not None else None
+
+
 def crop_img(filename: str, x_rate: float, y_rate: float, my_logger: Logger):
     """
     x, y 비율만큼 이미지를 잘라 같은 이름으로 저장
@@ -60,21 +255,7 @@ def crop_img(filename: str, x_rate: float, y_rate: float, my_logger: Logger):
     bool
         crop 성공 여부
     """
-    if not is_img(filename, my_logger):
-        return False
-
-    # cv2로 읽은 이미지 객체 만들기
-    src_img = Image.open(filename)
-    if src_img is None:
-        return False
-    src_arr = np.array(src_img)
-    heights, width, = [len(src_arr), len(src_arr[0])]
-
-    # pixel 배열을 슬라이스하여 이미지 자르기
-    cropped_arr = src_arr[0:int(heights * y_rate), 0:int(width * x_rate)]
-    Image.fromarray(cropped_arr).save(filename)
-
-    return is_img(filename, my_logger)
+    return ImageChain(filename, my_logger).crop(x_rate, y_rate).save()
 
 
 def crop_img_row(source_file, y1: int, y2: int, my_logger):
@@ -97,15 +278,7 @@ def crop_img_row(source_file, y1: int, y2: int, my_logger):
     bool
         crop 성공 여부
     """
-    if not is_img(source_file, my_logger):
-        return False
-    # 덮어쓸 이미지 모드를 동일하게 설정
-    source_img = Image.open(source_file).convert('RGBA')
-    src_arr = np.array(source_img)
-    src_arr = np.delete(src_arr, range(y1, y2), axis=0)
-    cropped_img = Image.fromarray(src_arr)
-    cropped_img.save(source_file)
-    return is_img(source_file, my_logger)
+    return ImageChain(source_file, my_logger).crop_row(y1, y2).save()
 
 
 def crop_img_col(source_file, x1: int, x2: int, my_logger):
@@ -128,15 +301,7 @@ def crop_img_col(source_file, x1: int, x2: int, my_logger):
     bool
         crop 성공 여부
     """
-    if not is_img(source_file, my_logger):
-        return False
-    # 덮어쓸 이미지 모드를 동일하게 설정
-    source_img = Image.open(source_file).convert('RGBA')
-    src_arr = np.array(source_img)
-    src_arr = np.delete(src_arr, range(x1, x2), axis=0)
-    cropped_img = Image.fromarray(src_arr)
-    cropped_img.save(source_file)
-    return is_img(source_file, my_logger)
+    return ImageChain(source_file, my_logger).crop_col(x1, x2).save()
 
 
 def merge_img_row(source_file: str, overlap_file: str, save_file: str, my_logger: Logger,
@@ -164,22 +329,7 @@ def merge_img_row(source_file: str, overlap_file: str, save_file: str, my_logger
     bool
         merge 성공 여부
     """
-    if not is_img(source_file, my_logger) or not is_img(overlap_file, my_logger):
-        return False
-
-    try:
-        # 덮어쓸 이미지 모드를 동일하게 설정
-        source_img = Image.open(source_file).convert('RGBA')
-        overlap_img = Image.open(overlap_file).convert('RGBA')
-
-        canvas = Image.new("RGBA", source_img.size)
-        canvas.paste(source_img, (0, 0), source_img)
-        canvas.paste(overlap_img, (x_offset, y_offset), overlap_img)
-        canvas.save(save_file)
-        return True
-    except Exception as e:
-        print(e)
-        return False
+    return ImageChain(source_file, my_logger).merge(overlap_file, x_offset, y_offset).save(save_file)
 
 
 def resize_img(img_file: str, width: int, height: int, img_format: str, save_file: str, my_logger):
@@ -206,22 +356,14 @@ def resize_img(img_file: str, width: int, height: int, img_format: str, save_fil
     bool
         resize 성공 여부
     """
-    if not is_img(img_file, my_logger):
-        return False
-
     if img_format.lower() not in ['png', 'jpeg']:
         my_logger.error("지정할 수 있는 포맷은 png, jpeg 뿐입니다! - " + img_format.lower())
         return False
 
-    img = Image.open(img_file)
-    resized_img = img.resize((width, height))
-    resized_img.save(save_file, img_format, quality=95)
-
-    if not is_img(save_file, my_logger):
+    if not ImageChain(img_file, my_logger).resize(width, height).save(save_file, img_format, quality=95):
         my_logger.error("이미지 파일이 생성되지 않았습니다! - " + save_file)
         return False
-    else:
-        return True
+    return True
 
 
 def get_img_from_url(url: str, save_file: str, img_format: str, my_logger: Logger):
@@ -288,32 +430,279 @@ def get_optimized_size(img_file: str, max_width: int, max_height: int, my_logger
     if not is_img(img_file, my_logger):
         return False
 
-    img = Image.open(img_file)
-    ratio = 1.0
-    origin_w, origin_h = img.size
-    curr_w = origin_w * ratio
-    curr_h = origin_h * ratio
-    if curr_w > max_width or curr_h > max_height:
-        while curr_w > max_width or curr_h > max_height:
-            curr_w = origin_w * ratio
-            curr_h = origin_h * ratio
-            ratio -= 0.001
+    with Image.open(img_file) as img:
+        origin_w, origin_h = img.size
+    return calc_optimized_size(origin_w, origin_h, max_width, max_height)
+
+
+def calc_optimized_size(origin_w: int, origin_h: int, max_width: int, max_height: int):
+    """
+    get_optimized_size 의 계산부. 원본 비율을 유지하면서 max 너비/높이 안에 들어가는 가장 큰 크기를
+    0.001 단위 비율로 계산 (반복 대신 바로 계산)
+
+    Parameters
+    ----------
+    origin_w : int
+        원본 너비
+    origin_h : int
+        원본 높이
+    max_width : int
+        최대 확장 가능한 너비
+    max_height : int
+        최대 확장 가능한 높이
+
+    Returns
+    -------
+    list[int, int]
+        [w, h] <- 최적화된 [너비, 높이]
+    """
+    ratio = math.floor(min(max_width / origin_w, max_height / origin_h) * 1000) / 1000
+    return int(origin_w * ratio), int(origin_h * ratio)
+
 
+def is_within_ocr_budget(content: bytes, max_pixels: int = 3000000, grayscale: bool = True):
+    """
+    이미지 헤더만 읽어 (픽셀은 디코딩하지 않음) 이미 OCR 업로드 예산 안의 JPEG 인지 확인
+
+    Parameters
+    ----------
+    content : bytes
+        인코딩된 이미지 바이트
+    max_pixels : int
+        허용할 최대 픽셀 수 (너비 * 높이)
+    grayscale : bool
+        흑백(L) 이어야 하는지 여부
+
+    Returns
+    -------
+    bool
+        JPEG 이고 픽셀 수와 색상이 예산 안이면 True
+    """
+    with Image.open(BytesIO(content)) as img:
+        return (img.format == 'JPEG' and img.size[0] * img.size[1] <= max_pixels
+                and (not grayscale or img.mode == 'L'))
+
+
+def optimize_for_ocr(content: bytes, max_pixels: int = 3000000, grayscale: bool = True, quality: int = 80):
+    """
+    OCR 업로드 전 이미지를 픽셀 예산 안으로 줄이고 흑백 변환 후 JPEG 품질을 낮춰 다시 인코딩
+    결과가 원본보다 크면 원본을 그대로 반환
+
+    Parameters
+    ----------
+    content : bytes
+        인코딩된 원본 이미지 바이트
+    max_pixels : int
+        허용할 최대 픽셀 수 (너비 * 높이), 이보다 작은 이미지는 확대하지 않음
+    grayscale : bool
+        흑백(L) 변환 여부
+    quality : int
+        JPEG 인코딩 품질
+
+    Returns
+    -------
+    bytes
+        업로드할 이미지 바이트
+    """
+    with Image.open(BytesIO(content)) as img:
+        img.load()
+        origin_w, origin_h = img.size
+        optimized_img = img.convert('L') if grayscale and img.mode != 'L' else img
+        if origin_w * origin_h > max_pixels:
+            scale = math.sqrt(max_pixels / (origin_w * origin_h))
+            optimized_img = optimized_img.resize(
+                calc_optimized_size(origin_w, origin_h, int(origin_w * scale), int(origin_h * scale)),
+                Image.LANCZOS)
+        optimized = encode_img(optimized_img, 'JPEG', quality)
+    return optimized if len(optimized) < len(content) else content
+
+
+def plan_mosaic(sizes: list, max_width: int = 2400, max_pixels: int = 8000000, max_tiles: int = 8, gap: int = 40):
+    """
+    이미지 크기 리스트를 한 장의 캔버스에 줄 단위(shelf)로 배치하는 계획 수립
+    캔버스 너비/픽셀 수/타일 수 상한을 넘으면 다음 캔버스로 넘기며, 입력 순서는 유지함
+
+    Parameters
+    ----------
+    sizes : list[tuple[int, int]]
+        이미지별 (너비, 높이)
+    max_width : int
+        캔버스 최대 너비, 이보다 넓은 이미지는 단독 캔버스가 됨
+    max_pixels : int
+        캔버스 최대 픽셀 수 (너비 * 높이)
+    max_tiles : int
+        캔버스 하나에 담을 최대 이미지 수
+    gap : int
+        타일 사이 여백 (글자가 옆 타일의 단어와 붙지 않도록)
+
+    Returns
+    -------
+    list[tuple[list[int], list[tuple[int, int]], tuple[int, int]]]
+        캔버스별 (입력 index 리스트, 타일별 (x, y) 위치, 캔버스 (너비, 높이))
+    """
+    plans = []
+    indexes, positions = [], []
+    canvas_w, canvas_h = 0, 0
+    row_x, row_y, row_h = 0, 0, 0
+    for index, (width, height) in enumerate(sizes):
+        # 현재 줄에 이어 붙일 수 없으면 다음 줄로 내려 배치
+        x, y, next_row_h = row_x, row_y, max(row_h, height)
+        if row_x > 0 and row_x + width > max_width:
+            x, y, next_row_h = 0, row_y + row_h + gap, height
+        next_w, next_h = max(canvas_w, x + width), max(canvas_h, y + next_row_h)
+        if indexes and (len(indexes) >= max_tiles or next_w > max_width or next_w * next_h > max_pixels):
+            plans.append((indexes, positions, (canvas_w, canvas_h)))
+            indexes, positions = [], []
+            x, y, next_row_h = 0, 0, height
+            next_w, next_h = width, height
+        indexes.append(index)
+        positions.append((x, y))
+        canvas_w, canvas_h = next_w, next_h
+        row_x, row_y, row_h = x + width + gap, y, next_row_h
+    if indexes:
+        plans.append((indexes, positions, (canvas_w, canvas_h)))
+    return plans
+
+
+def compose_mosaic(contents: list, positions: list, canvas_size: tuple, quality: int = 85):
+    """
+    여러 이미지를 흰 캔버스의 지정 위치에 덮어써 한 장의 이미지로 인코딩 (merge_img_row 의 합성을 여러 장으로 확장)
+
+    Parameters
+    ----------
+    contents : list[bytes]
+        인코딩된 타일 이미지 바이트 리스트
+    positions : list[tuple[int, int]]
+        타일별 캔버스 위 (x, y) 위치
+    canvas_size : tuple[int, int]
+        캔버스 (너비, 높이)
+    quality : int
+        JPEG 인코딩 품질
+
+    Returns
+    -------
+    bytes
+        캔버스 이미지 바이트
+    """
+    tiles = []
+    for content in contents:
+        with Image.open(BytesIO(content)) as img:
+            img.load()
+            tiles.append(img.copy())
+    # 모든 타일이 흑백이면 흑백 캔버스로 업로드 크기를 줄임
+    mode = 'L' if all(tile.mode == 'L' for tile in tiles) else 'RGB'
+    canvas = Image.new(mode, canvas_size, 'white')
+    for tile, position in zip(tiles, positions):
+        canvas.paste(tile if tile.mode == mode else tile.convert(mode), position)
+    return encode_img(canvas, 'JPEG', quality)
+
+
+def get_img_size(content: bytes):
+    """
+    이미지 바이트를 디코딩하지 않고 헤더만 읽어 (너비, 높이) 반환
+    """
+    with Image.open(BytesIO(content)) as img:
+        return img.size
+
+
+def get_page_files(filename: str, target_path: str):
+    """
+    target_path 에 이미 적재된, filename 으로부터 만들어진 이미지 파일들을 페이지 순서대로 반환
+    (name.jpg 혹은 name(1).jpg, name(2).jpg ... 형식)
+
+    Parameters
+    ----------
+    filename : str
+        원본 파일명
+    target_path : str
+        이미지가 적재된 경로
+
+    Returns
+    -------
+    list[str]
+        페이지 순서로 정렬된 이미지 경로 리스트
+    """
+    base_filename = os.path.splitext(os.path.basename(filename))[0]
+    page_list = []
+    for img_file in os.listdir(target_path):
+        img_base, img_ext = os.path.splitext(img_file)
+        if img_ext.lower() not in ['.png', '.jpg', '.jpeg']:
+            continue
+        if img_base == base_filename:
+            page_list.append((0, img_file))
+        elif img_base.startswith(base_filename + '(') and img_base.endswith(')') \
+                and img_base[len(base_filename) + 1:-1].isdigit():
+            page_list.append((int(img_base[len(base_filename) + 1:-1]), img_file))
+    return [os.path.join(target_path, img_file) for _, img_file in sorted(page_list)]
+
+
+def prepare_img(filename: str, original_path: str, target_path: str, my_logger: Logger, page_window: int = 1,
+                manifest: IngestManifest = None, render_profile: RenderProfile = None):
+    """
+    original_path 의 파일 하나를 target_path 에 이미지 파일로 적재하고 적재된 이미지 리스트 반환
+    이미 변환된 파일이면 변환 없이 기존 이미지 리스트를 반환
+
+    Parameters
+    ----------
+    filename : str
+        original_path 내 파일명
+    original_path : str
+        Invoice 원본이 적재된 경로
+    target_path : str
+        pdf를 이미지로 변환하여 적재할 경로 (원본 이미지의 경우 그대로 복사하여 이 경로로 이동)
+    my_logger : Logger
+        사용할 로깅 객체
+    page_window : int
+        pdf 를 한 번에 렌더링할 페이지 수
+    manifest : IngestManifest
+        처리 이력 manifest, 없으면 target_path 를 순회하여 중복 여부 확인
+    render_profile : RenderProfile
+        OCR 목표 해상도/색상 렌더링 설정
+
+    Returns
+    -------
+    list[str]
+        페이지 순서대로 적재된 이미지 경로 리스트, 실패 시 None
+    """
+    if manifest is not None:
+        # manifest 로 O(1) 확인, 원본이 바뀌었으면 다시 변환
+        state = manifest.check(original_path + filename)
+        if state == STATE_UNCHANGED:
+            page_list = manifest.get_pages(filename)
+            if all(os.path.isfile(img_file) for img_file in page_list):
+                my_logger.warning("Already formatted : " + filename)
+                return page_list
+        elif state == STATE_CHANGED:
+            my_logger.info("원본 파일이 변경되어 다시 변환합니다: " + filename)
+    # 만일 이미 format 된 거면 기존 이미지 그대로 사용
+    elif is_duplicated(filename, target_path):
+        my_logger.warning("Already formatted : " + filename)
+        return get_page_files(filename, target_path)
+
+    # 파일 형식이 pdf면 pdf를 이미지로 변환
+    if filename.lower().endswith('.pdf'):
+        my_logger.info("PDF 이미지화: " + filename)
+        page_list = pdf_to_img_files(original_path + filename, target_path, my_logger, page_window, render_profile)
+    # 이미지 형식이면 복사
+    elif filename.lower().endswith(('.png', '.jpg', '.jpeg')):
+        shutil.copy(original_path + filename, target_path + filename)
+        page_list = [target_path + filename]
+    # 지정된 형식이 아닐 경우 실패
     else:
-        while curr_w < max_width and curr_h < max_height:
-            curr_w = origin_w * ratio
-            curr_h = origin_h * ratio
-            ratio += 0.001
-    # 1클릭 차이로 조건에 안 맞아 튕겼으니 직전 조건으로 회귀 및 적용
-    curr_w = int(origin_w * (ratio - 0.001))
-    curr_h = int(origin_h * (ratio - 0.001))
+        my_logger.error(filename + ': 지정되지 않은 형식. .pdf, .png, .jpg, .jpeg 가 아니면 안됩니다.')
+        return None
 
-    return curr_w, curr_h
+    if manifest is not None and page_list is not None:
+        manifest.record(original_path + filename, page_list)
+    return page_list
 
 
-def move_img(original_path: str, target_path: str, my_logger: Logger):
+def move_img(original_path: str, target_path: str, my_logger: Logger, workers: int = 1,
+             pages_per_task: int = 20, page_window: int = 1, manifest: IngestManifest = None,
+             render_profile: RenderProfile = None):
     """
     original_path 경로에 있는 pdf 파일/이미지 파일들을 target_path에 온전히 이미지 파일로만 적재
+    workers 가 2 이상이면 pdf 를 (큰 pdf 는 페이지 구간으로 나누어) 프로세스 풀에 분산하여 변환
 
     Parameters
     ----------
@@ -323,35 +712,322 @@ def move_img(original_path: str, target_path: str, my_logger: Logger):
         pdf를 이미지로 변환하여 적재할 경로 (원본 이미지의 경우 그대로 복사하여 이 경로로 이동)
     my_logger : Logger
         사용할 로깅 객체
+    workers : int
+        pdf 변환에 사용할 프로세스 수, 1 이하면 순차 변환
+    pages_per_task : int
+        프로세스 하나가 한 번에 맡을 최대 페이지 수
+    page_window : int
+        pdf 를 한 번에 렌더링할 페이지 수
+    manifest : IngestManifest
+        처리 이력 manifest, 없으면 target_path 를 순회하여 중복 여부 확인
+    render_profile : RenderProfile
+        OCR 목표 해상도/색상 렌더링 설정
 
     Returns
     -------
     bool
         성공/실패
     """
+    if workers > 1:
+        return move_img_parallel(original_path, target_path, my_logger, workers, pages_per_task, page_window,
+                                 manifest, render_profile)
     for filename in os.listdir(original_path):
         # 경로인지 파일인지 탐색 및 경로면 넘어가기
         if os.path.isdir(original_path + filename):
             my_logger.warning(filename + " 은/는 경로입니다.")
             continue
-        # 만일 이미 format 된 거면 넘어가기
-        if is_duplicated(filename, target_path):
+        if prepare_img(filename, original_path, target_path, my_logger, page_window, manifest,
+                       render_profile) is None:
+            return False
+    return True
+
+
+def _render_pdf_range(filename: str, save_dir: str, first_page: int, last_page: int, page_window: int,
+                      render_profile: RenderProfile = None):
+    """
+    프로세스 풀 작업 단위. pdf 의 페이지 구간을 렌더링하여 파일명 규칙에 따라 저장
+    실패 시 이 구간에서 만든 파일은 지우고 예외를 그대로 올림
+
+    Returns
+    -------
+    list[str]
+        생성된 이미지 경로 리스트
+    """
+    base_filename = os.path.splitext(os.path.basename(filename))[0]
+    processed_img_list = []
+    try:
+        for page_no, page_total, page in iter_pdf_pages(filename, page_window, first_page, last_page,
+                                                        render_profile):
+            img_name = get_page_img_name(save_dir, base_filename, page_no, page_total)
+            processed_img_list.append(img_name)
+            page.save(img_name, 'JPEG')
+    except Exception:
+        for img_name in processed_img_list:
+            if os.path.isfile(img_name):
+                os.remove(img_name)
+        raise
+    return processed_img_list
+
+
+def move_img_parallel(original_path: str, target_path: str, my_logger: Logger, workers: int,
+                      pages_per_task: int = 20, page_window: int = 1, manifest: IngestManifest = None,
+                      render_profile: RenderProfile = None):
+    """
+    move_img 의 프로세스 풀 버전. pdf 를 페이지 구간 단위 작업으로 나누어 여러 코어에서 동시에 렌더링
+    이미지 파일 복사는 현재 프로세스에서 처리하며, 한 pdf 라도 실패하면 해당 pdf 의 이미지를 모두 지우고 실패 반환
+
+    Parameters
+    ----------
+    original_path : str
+        Invoice 원본이 적재된 경로
+    target_path : str
+        pdf를 이미지로 변환하여 적재할 경로
+    my_logger : Logger
+        사용할 로깅 객체
+    workers : int
+        사용할 프로세스 수
+    pages_per_task : int
+        프로세스 하나가 한 번에 맡을 최대 페이지 수
+    page_window : int
+        pdf 를 한 번에 렌더링할 페이지 수
+    manifest : IngestManifest
+        처리 이력 manifest, 없으면 target_path 를 순회하여 중복 여부 확인
+    render_profile : RenderProfile
+        OCR 목표 해상도/색상 렌더링 설정
+
+    Returns
+    -------
+    bool
+        성공/실패
+    """
+    pdf_list = []
+    for filename in os.listdir(original_path):
+        if os.path.isdir(original_path + filename):
+            my_logger.warning(filename + " 은/는 경로입니다.")
+            continue
+        if manifest is not None:
+            if manifest.is_processed(original_path + filename):
+                my_logger.warning("Already formatted : " + filename)
+                continue
+        elif is_duplicated(filename, target_path):
             my_logger.warning("Already formatted : " + filename)
             continue
-
-        # 파일 형식이 pdf면 pdf를 이미지로 변환
         if filename.lower().endswith('.pdf'):
-            my_logger.info("PDF 이미지화: " + filename)
-            if not pdf_to_img(original_path + filename, target_path, my_logger):
-                return False
-        # 이미지 형식이면 복사
+            pdf_list.append(filename)
         elif filename.lower().endswith(('.png', '.jpg', '.jpeg')):
             shutil.copy(original_path + filename, target_path + filename)
-        # 지정된 형식이 아닐 경우 넘어가기
+            if manifest is not None:
+                manifest.record(original_path + filename, [target_path + filename])
         else:
             my_logger.error(filename + ': 지정되지 않은 형식. .pdf, .png, .jpg, .jpeg 가 아니면 안됩니다.')
             return False
-    return True
+
+    is_success = True
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # pdf 별로 페이지 구간 작업을 나누어 제출
+        future_map = {}
+        for filename in pdf_list:
+            try:
+                page_total = pdfinfo_from_path(original_path + filename)['Pages']
+            except Exception as ex:
+                my_logger.error("PDF 파일을 이미지로 변환하는데 실패했습니다: " + filename + " -> {}".format(ex))
+                is_success = False
+                continue
+            my_logger.info("PDF 이미지화: " + filename + " (" + str(page_total) + "장)")
+            future_map[filename] = [executor.submit(_render_pdf_range, original_path + filename, target_path,
+                                                    first_page, min(first_page + pages_per_task - 1, page_total),
+                                                    page_window, render_profile)
+                                    for first_page in range(1, page_total + 1, pages_per_task)]
+
+        for filename, futures in future_map.items():
+            errors = [future.exception() for future in futures if future.exception() is not None]
+            if len(errors) == 0:
+                if manifest is not None:
+                    manifest.record(original_path + filename,
+                                    [img_name for future in futures for img_name in future.result()])
+                continue
+            my_logger.error("PDF 파일을 이미지로 변환하는데 실패했습니다: " + filename + " -> {}".format(errors[0]))
+            # 성공한 구간에서 만든 이미지도 모두 지울 것
+            for future in futures:
+                if future.exception() is None:
+                    for img_name in future.result():
+                        if os.path.isfile(img_name):
+                            os.remove(img_name)
+            is_success = False
+    return is_success
+
+
+def get_ink_stats(content: bytes, sample_size: int = 512, ink_delta: int = 50):
+    """
+    페이지 이미지를 축소한 흑백 배열에서 잉크 비율과 밝기 표준편차 계산 (빈 페이지 판별용)
+    잉크는 배경 밝기(중앙값)보다 ink_delta 이상 어두운 픽셀로 보아 회색 용지 스캔에도 동작하도록 함
+
+    Parameters
+    ----------
+    content : bytes
+        인코딩된 페이지 이미지 바이트
+    sample_size : int
+        계산 전 축소할 긴 변의 최대 픽셀 수
+    ink_delta : int
+        배경 대비 잉크로 볼 밝기 차이 (0-255)
+
+    Returns
+    -------
+    tuple[float, float]
+        (잉크 픽셀 비율, 밝기 표준편차)
+    """
+    with Image.open(BytesIO(content)) as img:
+        # JPEG 는 디코딩 단계에서 축소하여 원본 해상도 전체를 풀지 않음
+        img.draft('L', (sample_size, sample_size))
+        sample = img.convert('L')
+        sample.thumbnail((sample_size, sample_size))
+        arr = np.asarray(sample, dtype=np.float32)
+    background = np.median(arr)
+    ink_ratio = float(np.count_nonzero(arr < background - ink_delta)) / arr.size
+    return ink_ratio, float(arr.std())
+
+
+def is_blank_page(content: bytes, ink_threshold: float = 0.0001, std_threshold: float = 1.0):
+    """
+    잉크 비율과 밝기 표준편차가 모두 기준보다 낮은 (거의) 빈 페이지인지 판별
+    번호 한 줄만 있는 페이지도 잉크 비율 0.0003, 표준편차 1.5 정도로 낮으므로 둘 중 하나만으로는 판정하지 않음
+
+    Parameters
+    ----------
+    content : bytes
+        인코딩된 페이지 이미지 바이트
+    ink_threshold : float
+        잉크 비율이 이 값 미만이어야 빈 페이지
+    std_threshold : float
+        밝기 표준편차도 이 값 미만이어야 빈 페이지
+
+    Returns
+    -------
+    tuple[bool, float, float]
+        (빈 페이지 여부, 잉크 비율, 밝기 표준편차)
+    """
+    ink_ratio, std = get_ink_stats(content)
+    return ink_ratio < ink_threshold and std < std_threshold, ink_ratio, std
+
+
+def encode_img(img: Image.Image, img_format: str = 'JPEG', quality: int = 95):
+    """
+    이미지 객체를 파일로 저장하지 않고 메모리 버퍼에 인코딩
+
+    Parameters
+    ----------
+    img : PIL.Image.Image
+        인코딩할 이미지 객체
+    img_format : str
+        인코딩 포맷 (JPEG, PNG)
+    quality : int
+        JPEG 품질
+
+    Returns
+    -------
+    bytes
+        인코딩된 이미지 바이트
+    """
+    buffer = BytesIO()
+    if img_format.upper() == 'JPEG' and img.mode not in ['RGB', 'L']:
+        img = img.convert('RGB')
+    img.save(buffer, img_format, quality=quality)
+    return buffer.getvalue()
+
+
+def _iter_pdf_page_bytes(filename: str, page_window: int, render_profile: RenderProfile):
+    # pdf 를 page_window 장씩 렌더링하며 페이지마다 OCR 업로드 품질로 한 번만 인코딩
+    base_filename = os.path.splitext(os.path.basename(filename))[0]
+    quality = render_profile.quality if render_profile is not None else 95
+    for page_no, page_total, page in iter_pdf_pages(filename, page_window, render_profile=render_profile):
+        yield (os.path.basename(get_page_img_name('', base_filename, page_no, page_total)),
+               encode_img(page, 'JPEG', quality))
+
+
+def _iter_audited_pages(filename: str, pages, my_logger: Logger, audit_dir: str):
+    try:
+        for img_name, content in pages:
+            if audit_dir is not None:
+                with open(os.path.join(audit_dir, img_name), 'wb') as f:
+                    f.write(content)
+            yield img_name, content
+    except Exception as ex:
+        my_logger.error("이미지 변환에 실패했습니다: " + filename + " -> {}".format(ex))
+        raise
+    finally:
+        # 소비하는 쪽이 도중에 멈춰도 렌더링 임시 폴더를 바로 정리
+        if hasattr(pages, 'close'):
+            pages.close()
+
+
+def load_page_bytes(filename: str, original_path: str, my_logger: Logger, page_window: int = 1,
+                    audit_dir: str = None, render_profile: RenderProfile = None):
+    """
+    원본 파일 하나를 페이지별 인코딩된 이미지 바이트로 한 장씩 돌려주는 iterator 생성
+    pdf 는 소비하는 쪽이 다음 장을 요청할 때 page_window 장씩 렌더링하여 메모리에서 한 번만 인코딩하므로
+    문서 장수와 상관 없이 메모리 사용량이 일정함. audit_dir 이 있을 때만 같은 바이트를 감사용으로 저장
+
+    Parameters
+    ----------
+    filename : str
+        original_path 내 파일명
+    original_path : str
+        Invoice 원본이 적재된 경로
+    my_logger : Logger
+        사용할 로깅 객체
+    page_window : int
+        pdf 를 한 번에 렌더링할 페이지 수
+    audit_dir : str
+        페이지 이미지를 남길 경로, None 이면 디스크에 쓰지 않음
+    render_profile : RenderProfile
+        OCR 목표 해상도/색상 렌더링 설정
+
+    Returns
+    -------
+    generator[tuple[str, bytes]]
+        페이지 순서대로 (페이지 이미지명, 이미지 바이트), 지원하지 않는 형식이면 None
+        (렌더링 도중 실패하면 로그를 남기고 소비하는 쪽으로 예외 전달)
+    """
+    if filename.lower().endswith('.pdf'):
+        my_logger.info("PDF 이미지화: " + filename)
+        pages = _iter_pdf_page_bytes(original_path + filename, page_window, render_profile)
+    elif filename.lower().endswith(('.png', '.jpg', '.jpeg')):
+        # 원본 이미지는 다시 인코딩하지 않고 그대로 사용
+        try:
+            with open(original_path + filename, 'rb') as f:
+                pages = iter([(filename, f.read())])
+        except OSError as ex:
+            my_logger.error("이미지 변환에 실패했습니다: " + filename + " -> {}".format(ex))
+            return None
+    else:
+        my_logger.error(filename + ': 지정되지 않은 형식. .pdf, .png, .jpg, .jpeg 가 아니면 안됩니다.')
+        return None
+    return _iter_audited_pages(filename, pages, my_logger, audit_dir)
+
+
+def extract_pdf_text(filename: str, timeout: float = 60):
+    """
+    poppler 의 pdftotext 로 pdf 에 내장된 텍스트 레이어를 페이지별로 추출 (전자 발급 pdf 는 OCR 없이 텍스트 확보 가능)
+
+    Parameters
+    ----------
+    filename : str
+        pdf 경로, 파일명
+    timeout : float
+        pdftotext 최대 수행 시간 (초)
+
+    Returns
+    -------
+    list[str]
+        페이지 순서대로의 텍스트 리스트, 텍스트 레이어가 없는 페이지는 빈 문자열
+    """
+    completed = subprocess.run(['pdftotext', '-layout', '-enc', 'UTF-8', filename, '-'],
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout, check=True)
+    # 페이지는 form feed 로 구분되며 마지막 페이지 뒤에도 붙음
+    page_texts = completed.stdout.decode('utf-8', errors='replace').split('\f')
+    if len(page_texts) > 1 and page_texts[-1].strip() == '':
+        page_texts = page_texts[:-1]
+    return page_texts
 
 
 def pdf_to_img(filename: str, save_dir: str, my_logger: Logger):
@@ -372,32 +1048,146 @@ def pdf_to_img(filename: str, save_dir: str, my_logger: Logger):
     bool
         성공/실패
     """
+    return pdf_to_img_files(filename, save_dir, my_logger) is not None
+
+
+def get_page_img_name(save_dir: str, base_filename: str, page_no: int, page_total: int):
+    """
+    pdf 변환 이미지 파일명 규칙 적용. 한 장이면 name.jpg, 여러 장이면 name(1).jpg, name(2).jpg ...
+
+    Parameters
+    ----------
+    save_dir : str
+        이미지 저장 경로
+    base_filename : str
+        확장자를 제외한 pdf 파일명
+    page_no : int
+        1부터 시작하는 페이지 번호
+    page_total : int
+        pdf 전체 페이지 수
+
+    Returns
+    -------
+    str
+        이미지 경로, 파일명
+    """
+    if page_total == 1:
+        return os.path.join(save_dir, base_filename) + '.jpg'
+    return os.path.join(save_dir, base_filename) + '(' + str(page_no) + ').jpg'
+
+
+def get_target_dpi(page_size: str, target_pixels: int, min_dpi: int = 72, max_dpi: int = 600):
+    """
+    pdfinfo 의 Page size (pt 단위 media box) 로부터 페이지가 target_pixels 픽셀이 되는 렌더링 dpi 계산
+
+    Parameters
+    ----------
+    page_size : str
+        pdfinfo 의 Page size 값 (ex. '595.276 x 841.89 pts (A4)')
+    target_pixels : int
+        렌더링 결과의 목표 픽셀 수 (너비 * 높이)
+    min_dpi : int
+        최소 dpi
+    max_dpi : int
+        최대 dpi
+
+    Returns
+    -------
+    int
+        렌더링 dpi
+    """
+    width_pt, height_pt = [float(value) for value in page_size.split('pts')[0].split('x')]
+    # 1 inch = 72 pt
+    area_inch = (width_pt / 72) * (height_pt / 72)
+    return int(max(min_dpi, min(max_dpi, math.sqrt(target_pixels / area_inch))))
+
+
+def iter_pdf_pages(filename: str, page_window: int = 1, first_page: int = 1, last_page: int = None,
+                   render_profile: RenderProfile = None):
+    """
+    pdf 를 page_window 장씩만 렌더링하여 한 장씩 돌려주는 generator
+    렌더링 결과는 임시 폴더의 파일로 받아 사용 후 바로 지우므로 pdf 장수와 상관 없이 메모리 사용량이 일정함
+
+    Parameters
+    ----------
+    filename : str
+        pdf 경로, 파일명
+    page_window : int
+        한 번에 렌더링할 페이지 수
+    first_page : int
+        렌더링 시작 페이지 (1부터 시작)
+    last_page : int
+        렌더링 마지막 페이지, None 이면 마지막 장까지
+    render_profile : RenderProfile
+        OCR 목표 해상도/색상 렌더링 설정, None 이면 pdf2image 기본값 (200dpi, RGB)
+
+    Returns
+    -------
+    generator[tuple[int, int, PIL.Image.Image]]
+        (페이지 번호, 전체 페이지 수, 페이지 이미지). 이미지는 다음 장으로 넘어가면 닫히므로 그 전에 사용할 것
+    """
+    pdf_info = pdfinfo_from_path(filename)
+    page_total = pdf_info['Pages']
+    if last_page is None or last_page > page_total:
+        last_page = page_total
+    render_options = {}
+    if render_profile is not None:
+        # 목표 픽셀 수에 맞는 dpi 로 한 번만 렌더링하여 이후 리사이즈 재인코딩을 없앰
+        if render_profile.target_pixels > 0 and 'Page size' in pdf_info:
+            render_options['dpi'] = get_target_dpi(pdf_info['Page size'], render_profile.target_pixels)
+        render_options['grayscale'] = render_profile.grayscale
+        render_options['thread_count'] = render_profile.thread_count
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for window_first in range(first_page, last_page + 1, page_window):
+            window_last = min(window_first + page_window - 1, last_page)
+            page_files = convert_from_path(filename, first_page=window_first, last_page=window_last,
+                                           output_folder=tmp_dir, paths_only=True, **render_options)
+            # 스레드마다 파일명 접두어(uuid)가 달라 이름순 정렬은 페이지 순서와 다르므로 반환된 순서 그대로 사용
+            for page_no, page_file in zip(range(window_first, window_last + 1), page_files):
+                with Image.open(page_file) as page:
+                    yield page_no, page_total, page
+                os.remove(page_file)
+
+
+def pdf_to_img_files(filename: str, save_dir: str, my_logger: Logger, page_window: int = 1,
+                     render_profile: RenderProfile = None):
+    """
+    pdf_to_img 와 동일하게 변환하되 생성된 이미지 경로 리스트를 반환
+    한 번에 page_window 장씩만 렌더링하여 렌더링 되는 대로 저장
+
+    Parameters
+    ----------
+    filename : str
+        pdf 경로, 파일명
+    save_dir : str
+        이미지 변환 후 저장할 경로, 파일명
+    my_logger : Logger
+        사용할 로깅 객체
+    page_window : int
+        한 번에 렌더링할 페이지 수
+    render_profile : RenderProfile
+        OCR 목표 해상도/색상 렌더링 설정
+
+    Returns
+    -------
+    list[str]
+        페이지 순서대로 생성된 이미지 경로 리스트, 실패 시 None
+    """
     # 대상 pdf에서 확장자명 제외하고 이름만 추출
     base_filename = os.path.splitext(os.path.basename(filename))[0]
     processed_img_list = []
     try:
-        # pdf 파일 내 각 장을 리스트로 변환
-        pages = convert_from_path(filename)
-        # 만약 한장이라면
-        if len(pages) == 1:
-            # 0번째 index를 가져옴 (한장이더라도 리스트로 반환하기 때문)
-            img_name = os.path.join(save_dir, base_filename) + '.jpg'
+        # 한 장씩 렌더링 되는 대로 파일 인덱싱을 하여 저장
+        for page_no, page_total, page in iter_pdf_pages(filename, page_window, render_profile=render_profile):
+            img_name = get_page_img_name(save_dir, base_filename, page_no, page_total)
             processed_img_list.append(img_name)
-            pages[0].save(img_name, 'JPEG')
-        else:
-            # 여러장이면 각 장을 [0], [1] 순으로 파일 인덱싱을 새로 하여 저장
-            page_count = 1
-            for page in pages:
-                img_name = os.path.join(save_dir, base_filename) + '(' + str(page_count) + ').jpg'
-                processed_img_list.append(img_name)
-                page.save(img_name, 'JPEG')
-                page_count += 1
+            page.save(img_name, 'JPEG')
 
     except Exception as ex:
         my_logger.error("PDF 파일을 이미지로 변환하는데 실패했습니다: " + filename + " -> {}".format(ex))
         # 혹시 일부가 이미 이미지로 변환되었다면 해당 파일을 모두 지울 것
-        for img in os.listdir(save_dir):
-            if img in processed_img_list:
-                os.remove(save_dir + img)
-        return False
-    return True
+        for img_name in processed_img_list:
+            if os.path.isfile(img_name):
+                os.remove(img_name)
+        return None
+    return processed_img_list
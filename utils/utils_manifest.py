@@ -0,0 +1,200 @@
+# 표준 라이브러리
+import os
+import io
+import json
+import time
+import hashlib
+import threading
+from logging import Logger
+# 3rd party
+# 내부 패키지
+
+# check 결과 상태
+STATE_NEW = 'new'
+STATE_UNCHANGED = 'unchanged'
+STATE_CHANGED = 'changed'
+
+
+def get_file_hash(target_file: str, chunk_size: int = 1024 * 1024):
+    """
+    파일 내용의 sha256 해시 계산 (큰 파일도 chunk 단위로 읽음)
+
+    Parameters
+    ----------
+    target_file : str
+        해시를 계산할 파일 경로
+    chunk_size : int
+        한 번에 읽을 바이트 수
+
+    Returns
+    -------
+    str
+        sha256 hex 문자열
+    """
+    digest = hashlib.sha256()
+    with io.open(target_file, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class IngestManifest:
+    """
+    원본 파일별 크기, 수정 시각, 내용 해시, 변환된 페이지 이미지 목록을 기록하는 적재 manifest
+    전처리 폴더를 매번 순회하지 않고 O(1) 로 "이미 처리했는지" 확인하고, 원본이 바뀐 경우를 감지하기 위함
+
+    Attributes
+    ----------
+    manifest_file : str
+        manifest 를 저장할 json 파일 경로
+    entries : dict
+        {원본 파일명: {'size', 'mtime', 'sha256', 'pages', 'processed_at'}}
+    """
+
+    def __init__(self, manifest_file: str, my_logger: Logger = None):
+        self.manifest_file = manifest_file
+        self.logger = my_logger
+        self.entries = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.load()
+
+    def load(self):
+        """
+        manifest 파일을 읽어 메모리에 적재, 파일이 없거나 깨졌으면 빈 manifest 로 시작
+        """
+        if not os.path.isfile(self.manifest_file):
+            return
+        try:
+            with io.open(self.manifest_file, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as ex:
+            if self.logger is not None:
+                self.logger.warning("manifest 로드 실패, 빈 manifest 로 시작: " + self.manifest_file
+                                    + " -> {}".format(ex))
+            return
+        with self._lock:
+            self.entries = entries
+
+    def check(self, source_file: str):
+        """
+        원본 파일의 처리 상태 확인. 크기/수정 시각이 같으면 해시 계산 없이 판단하고,
+        수정 시각만 바뀐 경우엔 해시를 비교하여 실제 내용 변경 여부를 확인
+
+        Parameters
+        ----------
+        source_file : str
+            원본 파일 경로
+
+        Returns
+        -------
+        str
+            STATE_NEW, STATE_UNCHANGED, STATE_CHANGED 중 하나
+        """
+        key = os.path.basename(source_file)
+        with self._lock:
+            entry = self.entries.get(key)
+        if entry is None:
+            return STATE_NEW
+        stat = os.stat(source_file)
+        if stat.st_size != entry['size']:
+            return STATE_CHANGED
+        if stat.st_mtime == entry['mtime']:
+            return STATE_UNCHANGED
+        if get_file_hash(source_file) != entry['sha256']:
+            return STATE_CHANGED
+        # 내용은 같고 수정 시각만 바뀐 경우, 다음 확인부터는 해시 계산을 생략하도록 갱신
+        with self._lock:
+            entry['mtime'] = stat.st_mtime
+            self._dirty = True
+        return STATE_UNCHANGED
+
+    def is_processed(self, source_file: str):
+        """
+        원본 파일이 변경 없이 이미 처리되었는지 여부
+
+        Parameters
+        ----------
+        source_file : str
+            원본 파일 경로
+
+        Returns
+        -------
+        bool
+            처리 완료 및 변경 없음 여부
+        """
+        return self.check(source_file) == STATE_UNCHANGED
+
+    def get_pages(self, source_file: str):
+        """
+        원본 파일로부터 변환된 페이지 이미지 목록
+
+        Parameters
+        ----------
+        source_file : str
+            원본 파일 경로 혹은 파일명
+
+        Returns
+        -------
+        list[str]
+            페이지 순서대로의 이미지 경로 리스트, 기록이 없으면 None
+        """
+        with self._lock:
+            entry = self.entries.get(os.path.basename(source_file))
+        return list(entry['pages']) if entry is not None else None
+
+    def record(self, source_file: str, pages: list):
+        """
+        원본 파일의 현재 상태와 변환된 페이지 이미지 목록 기록
+
+        Parameters
+        ----------
+        source_file : str
+            원본 파일 경로
+        pages : list[str]
+            변환된 페이지 이미지 경로 리스트
+        """
+        stat = os.stat(source_file)
+        entry = {
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'sha256': get_file_hash(source_file),
+            'pages': list(pages),
+            'processed_at': time.time(),
+        }
+        with self._lock:
+            self.entries[os.path.basename(source_file)] = entry
+            self._dirty = True
+
+    def remove(self, source_file: str):
+        """
+        원본 파일 기록 삭제
+        """
+        with self._lock:
+            if self.entries.pop(os.path.basename(source_file), None) is not None:
+                self._dirty = True
+
+    def save(self):
+        """
+        변경 사항이 있을 때만 manifest 를 json 파일로 저장
+
+        Returns
+        -------
+        bool
+            저장 성공 여부
+        """
+        with self._lock:
+            if not self._dirty:
+                return True
+            entries = {key: dict(entry) for key, entry in self.entries.items()}
+            self._dirty = False
+        tmp_file = self.manifest_file + '.tmp'
+        try:
+            with io.open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(entries, f, ensure_ascii=False)
+            os.replace(tmp_file, self.manifest_file)
+        except OSError as ex:
+            if self.logger is not None:
+                self.logger.error("manifest 저장 실패: " + self.manifest_file + " -> {}".format(ex))
+            return False
+        return True
@@ -0,0 +1,175 @@
+# 표준 라이브러리
+import time
+import sqlite3
+import threading
+from io import BytesIO
+from logging import Logger
+# 3rd party
+from PIL import Image
+import numpy as np
+# 내부 패키지
+from extractor import find_bsn_candidates
+
+
+def dhash(content: bytes, hash_size: int = 16):
+    """
+    이미지의 difference hash 계산. 축소한 흑백 이미지에서 가로로 인접한 픽셀 밝기의 대소를 비트로 담음
+    재스캔/재압축 등 미세한 차이에는 비트가 거의 바뀌지 않아 근사 중복 판별에 사용
+
+    Parameters
+    ----------
+    content : bytes
+        인코딩된 이미지 바이트
+    hash_size : int
+        해시 격자 크기, 결과는 hash_size * hash_size 비트
+
+    Returns
+    -------
+    int
+        hash_size * hash_size 비트 정수 해시
+    """
+    with Image.open(BytesIO(content)) as img:
+        img.draft('L', (hash_size * 8, hash_size * 8))
+        small = img.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS)
+        arr = np.asarray(small, dtype=np.int16)
+    bits = (arr[:, 1:] > arr[:, :-1]).flatten()
+    return int(''.join('1' if bit else '0' for bit in bits), 2)
+
+
+def hamming_distance(hash_a: int, hash_b: int):
+    """
+    두 해시의 서로 다른 비트 수
+    """
+    return bin(hash_a ^ hash_b).count('1')
+
+
+class PhashIndex:
+    """
+    페이지 perceptual hash 와 이전 OCR 결과를 보관하는 sqlite 인덱스
+    해시를 (max_distance + 1) 개 구간으로 나누어 구간 값마다 색인하면, 거리 max_distance 이내의 해시는
+    최소 한 구간이 반드시 같으므로 (비둘기집 원리) 전체를 훑지 않고 후보만 비교할 수 있음
+
+    perceptual hash 는 글자 몇 개의 차이를 구분하지 못해 같은 양식의 다른 등록증도 가까운 해시가 나옴
+    (번호/상호만 다른 등록증이 거리 2). 그래서 사업자 등록 번호가 담긴 페이지의 텍스트는 저장도 재사용도 하지 않고
+    번호가 없는 페이지 (첨부 안내문, 표지 등) 의 OCR 결과만 재사용함
+    재스캔한 등록증처럼 번호가 담긴 근사 중복 페이지는 재사용 대상이 아니므로, 등록증 위주의 입력에서는 절약되는
+    호출이 거의 없음 (번호를 확인하지 않고는 다른 문서의 번호를 돌려줄 위험을 피할 수 없어 의도적으로 제외)
+
+    Attributes
+    ----------
+    index_file : str
+        sqlite 파일 경로
+    hash_size : int
+        dhash 격자 크기
+    max_distance : int
+        같은 페이지로 볼 최대 해밍 거리
+    """
+
+    def __init__(self, index_file: str, hash_size: int = 16, max_distance: int = 6, my_logger: Logger = None):
+        self.index_file = index_file
+        self.hash_size = hash_size
+        self.max_distance = max_distance
+        self.logger = my_logger
+        self.hits = 0
+        self._lock = threading.Lock()
+        self._bits = hash_size * hash_size
+        self._bands = self._make_bands(self._bits, max_distance + 1)
+        self._conn = sqlite3.connect(index_file, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS pages (id INTEGER PRIMARY KEY, hash TEXT, text TEXT, source TEXT,
+                                              created_at REAL);
+            CREATE TABLE IF NOT EXISTS bands (band_no INTEGER, band_value INTEGER, page_id INTEGER);
+            CREATE INDEX IF NOT EXISTS idx_bands ON bands (band_no, band_value);
+        """)
+        # 색인 구성이 다르면 기존 구간 값과 맞지 않으므로 인덱스를 새로 시작
+        layout = str(hash_size) + ':' + str(max_distance)
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'layout'").fetchone()
+        if row is not None and row[0] != layout:
+            if self.logger is not None:
+                self.logger.warning("phash 인덱스 구성이 바뀌어 초기화합니다: " + row[0] + " -> " + layout)
+            self._conn.executescript("DELETE FROM pages; DELETE FROM bands;")
+        self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('layout', ?)", (layout,))
+        self._conn.commit()
+
+    @staticmethod
+    def _make_bands(bits: int, band_count: int):
+        # 비트를 band_count 개의 (시작 비트, 길이) 구간으로 최대한 균등하게 분할
+        bands = []
+        start = 0
+        for band_no in range(band_count):
+            length = bits // band_count + (1 if band_no < bits % band_count else 0)
+            bands.append((start, length))
+            start += length
+        return bands
+
+    def _band_values(self, hash_value: int):
+        return [(hash_value >> start) & ((1 << length) - 1) for start, length in self._bands]
+
+    def find(self, content: bytes):
+        """
+        이미지와 거리 max_distance 이내로 가장 가까운 이전 페이지의 OCR 결과 조회
+
+        Parameters
+        ----------
+        content : bytes
+            인코딩된 이미지 바이트
+
+        Returns
+        -------
+        tuple[int, str]
+            (이미지 해시, 재사용할 OCR 텍스트), 없으면 텍스트는 None
+            (이전 버전에서 저장된 번호가 담긴 텍스트는 검증할 수 없으므로 재사용하지 않음)
+        """
+        hash_value = dhash(content, self.hash_size)
+        conditions = ' OR '.join(['(band_no = ? AND band_value = ?)'] * len(self._bands))
+        params = [value for band_no, band_value in enumerate(self._band_values(hash_value))
+                  for value in (band_no, band_value)]
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT pages.hash, pages.text FROM bands "
+                                      "JOIN pages ON pages.id = bands.page_id WHERE " + conditions,
+                                      params).fetchall()
+        best_text = None
+        best_distance = self.max_distance + 1
+        for candidate_hash, text in rows:
+            distance = hamming_distance(hash_value, int(candidate_hash, 16))
+            if distance < best_distance and self.is_reusable(text):
+                best_distance = distance
+                best_text = text
+        if best_text is not None:
+            self.hits += 1
+        return hash_value, best_text
+
+    @staticmethod
+    def is_reusable(text: str):
+        """
+        다른 이미지의 결과로 재사용해도 되는 텍스트인지 여부. 문서마다 달라야 하는 사업자 등록 번호가 있으면 재사용 불가
+        """
+        return text is not None and len(find_bsn_candidates(text)) == 0
+
+    def add(self, hash_value: int, text: str, source: str = None):
+        """
+        페이지 해시와 OCR 결과 저장. 재사용할 수 없는 텍스트 (사업자 등록 번호가 담긴 페이지) 는 저장하지 않음
+
+        Parameters
+        ----------
+        hash_value : int
+            find 에서 계산한 이미지 해시
+        text : str
+            OCR 결과 텍스트
+        source : str
+            원본 식별자 (파일명 등)
+        """
+        if not self.is_reusable(text):
+            return
+        with self._lock:
+            cursor = self._conn.execute("INSERT INTO pages (hash, text, source, created_at) VALUES (?, ?, ?, ?)",
+                                        (format(hash_value, 'x'), text, source, time.time()))
+            self._conn.executemany("INSERT INTO bands (band_no, band_value, page_id) VALUES (?, ?, ?)",
+                                   [(band_no, band_value, cursor.lastrowid)
+                                    for band_no, band_value in enumerate(self._band_values(hash_value))])
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
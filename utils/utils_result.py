@@ -0,0 +1,216 @@
+# 표준 라이브러리
+import io
+import re
+import csv
+import json
+import threading
+from logging import Logger
+# 3rd party
+# 내부 패키지
+
+# 문서별 결과 레코드 컬럼
+RESULT_FIELDS = ['file', 'pages', 'page', 'bsn', 'status', 'desc', 'company_name', 'representative', 'opening_date',
+                 'business_type', 'business_item', 'error', 'error_stage', 'total_sec', 'timings', 'processed_at']
+# total_result 파일에서 페이지/문서 경계로 읽히는 줄 ('N번째 장:', 'Img File: ', 'Business Number: ')
+# OCR 텍스트에 같은 모양의 줄이 있으면 앞에 '\' 를 하나 더 붙여 기록 (이미 '\' 로 시작하는 줄도 구분되도록 포함)
+RESULT_MARKER_PATTERN = re.compile(r'^\\*(?:\d+번째 장:$|Img File: |Business Number: )')
+
+
+def escape_result_text(text: str):
+    """
+    페이지 텍스트 중 결과 파일의 경계 줄로 읽힐 수 있는 줄 앞에 '\\' 를 붙임 (unescape_result_line 으로 복원)
+    """
+    return '\n'.join('\\' + line if RESULT_MARKER_PATTERN.match(line) else line for line in text.split('\n'))
+
+
+def unescape_result_line(line: str):
+    """
+    escape_result_text 로 기록한 줄 하나를 원래 텍스트로 복원
+    """
+    return line[1:] if line.startswith('\\') and RESULT_MARKER_PATTERN.match(line) else line
+
+
+def flatten_record(record: dict):
+    """
+    dict/list 값을 json 문자열로 바꾸어 csv/parquet 에 쓸 수 있는 평평한 레코드로 변환
+    """
+    return {field: json.dumps(record.get(field), ensure_ascii=False)
+            if isinstance(record.get(field), (dict, list)) else record.get(field)
+            for field in RESULT_FIELDS}
+
+
+class ResultSink:
+    """
+    문서 하나가 끝날 때마다 결과 레코드를 바로 파일에 기록하는 결과 저장소 인터페이스
+    run 도중 중단되어도 그때까지 끝난 문서의 결과는 남고, 메모리 사용량은 문서 수와 무관함
+
+    Attributes
+    ----------
+    name : str
+        포맷 식별자 (config 의 FORMAT 값과 동일)
+    extension : str
+        결과 파일 확장자
+    result_file : str
+        결과 파일 경로
+    count : int
+        기록한 레코드 수
+    """
+    name = 'base'
+    extension = ''
+
+    def __init__(self, result_file: str, my_logger: Logger = None):
+        self.result_file = result_file
+        self.logger = my_logger
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def write(self, record: dict):
+        """
+        레코드 하나 기록
+
+        Parameters
+        ----------
+        record : dict
+            RESULT_FIELDS 를 키로 갖는 문서별 결과
+        """
+        with self._lock:
+            self._write(record)
+            self.count += 1
+
+    def _write(self, record: dict):
+        raise NotImplementedError
+
+    def close(self):
+        """
+        남은 버퍼를 기록하고 파일을 닫음
+        """
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class JsonlSink(ResultSink):
+    """
+    레코드를 한 줄에 하나씩 json 으로 기록 (timings 등은 중첩 객체 그대로)
+    """
+    name = 'jsonl'
+    extension = '.jsonl'
+
+    def __init__(self, result_file: str, my_logger: Logger = None):
+        super().__init__(result_file, my_logger)
+        self._file = io.open(result_file, 'w', encoding='utf-8')
+
+    def _write(self, record: dict):
+        self._file.write(json.dumps({field: record.get(field) for field in RESULT_FIELDS}, ensure_ascii=False)
+                         + '\n')
+        self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class CsvSink(ResultSink):
+    """
+    레코드를 csv 한 행으로 기록 (엑셀에서 한글이 깨지지 않도록 utf-8-sig)
+    """
+    name = 'csv'
+    extension = '.csv'
+
+    def __init__(self, result_file: str, my_logger: Logger = None):
+        super().__init__(result_file, my_logger)
+        self._file = io.open(result_file, 'w', encoding='utf-8-sig', newline='')
+        self._writer = csv.DictWriter(self._file, fieldnames=RESULT_FIELDS)
+        self._writer.writeheader()
+
+    def _write(self, record: dict):
+        self._writer.writerow(flatten_record(record))
+        self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class ParquetSink(ResultSink):
+    """
+    레코드를 row_group_size 개씩 모아 parquet row group 으로 기록. pyarrow 가 설치되어 있을 때만 사용 가능
+    버퍼는 row group 하나 크기로 제한되며, 중단 시 마지막으로 기록한 row group 까지 남음
+
+    Attributes
+    ----------
+    row_group_size : int
+        row group 하나에 담을 레코드 수
+    """
+    name = 'parquet'
+    extension = '.parquet'
+
+    def __init__(self, result_file: str, my_logger: Logger = None, row_group_size: int = 1000):
+        import pyarrow
+        import pyarrow.parquet
+
+        super().__init__(result_file, my_logger)
+        self._pyarrow = pyarrow
+        self.row_group_size = row_group_size
+        self._schema = pyarrow.schema([
+            ('file', pyarrow.string()), ('pages', pyarrow.int32()), ('page', pyarrow.int32()),
+            ('bsn', pyarrow.string()), ('status', pyarrow.string()), ('desc', pyarrow.string()),
+            ('company_name', pyarrow.string()), ('representative', pyarrow.string()),
+            ('opening_date', pyarrow.string()), ('business_type', pyarrow.string()),
+            ('business_item', pyarrow.string()), ('error', pyarrow.string()), ('error_stage', pyarrow.string()),
+            ('total_sec', pyarrow.float64()), ('timings', pyarrow.string()), ('processed_at', pyarrow.float64()),
+        ])
+        self._writer = pyarrow.parquet.ParquetWriter(result_file, self._schema)
+        self._buffer = []
+
+    def _write(self, record: dict):
+        self._buffer.append(flatten_record(record))
+        if len(self._buffer) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if self._buffer:
+            self._writer.write_table(self._pyarrow.Table.from_pylist(self._buffer, schema=self._schema))
+            self._buffer = []
+
+    def close(self):
+        with self._lock:
+            self._flush()
+            self._writer.close()
+
+
+SINKS = {
+    JsonlSink.name: JsonlSink,
+    CsvSink.name: CsvSink,
+    ParquetSink.name: ParquetSink,
+}
+
+
+def create_sink(name: str, result_path: str, my_logger: Logger = None, **kwargs):
+    """
+    포맷 이름에 해당하는 결과 저장소 생성
+
+    Parameters
+    ----------
+    name : str
+        jsonl, csv, parquet 중 하나
+    result_path : str
+        확장자를 제외한 결과 파일 경로
+    my_logger : Logger
+        사용할 로깅 객체
+    kwargs :
+        저장소 생성자에 그대로 전달할 인자 (parquet 의 row_group_size 등)
+
+    Returns
+    -------
+    ResultSink
+        생성된 결과 저장소
+    """
+    if name.lower() not in SINKS:
+        raise ValueError('지원하지 않는 결과 포맷입니다: {} (사용 가능: {})'.format(name, ', '.join(SINKS)))
+    sink_class = SINKS[name.lower()]
+    return sink_class(result_path + sink_class.extension, my_logger, **kwargs)
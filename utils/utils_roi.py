@@ -0,0 +1,197 @@
+# 표준 라이브러리
+import os
+import io
+import json
+import statistics
+import threading
+from io import BytesIO
+from logging import Logger
+# 3rd party
+from PIL import Image
+# 내부 패키지
+from utils.utils_img import ImageChain
+from extractor import find_bsn_candidates
+
+
+def find_bsn_box(words: list):
+    """
+    OCR 단어 리스트에서 사업자 등록 번호를 이루는 단어들을 찾아 감싸는 영역 계산
+
+    Parameters
+    ----------
+    words : list[cloud_vision.OcrWord]
+        (text, (left, top, right, bottom)) 단어 리스트
+
+    Returns
+    -------
+    tuple[int, int, int, int]
+        번호를 감싸는 픽셀 영역, 없으면 None
+    """
+    joined = ''
+    owners = []
+    for word_index, word in enumerate(words):
+        joined += word.text
+        owners.extend([word_index] * len(word.text))
+    # 단어를 공백 없이 이어 붙였으므로 구분자가 없는 후보도 검증 숫자로 걸러짐
+    candidates = find_bsn_candidates(joined)
+    if len(candidates) == 0:
+        return None
+    start = candidates[0].start
+    boxes = [words[word_index].box for word_index in sorted(set(owners[start:start + len(candidates[0].raw)]))]
+    return (min(box[0] for box in boxes), min(box[1] for box in boxes),
+            max(box[2] for box in boxes), max(box[3] for box in boxes))
+
+
+class RoiTemplate:
+    """
+    사업자 등록증에서 사업자 등록 번호가 놓이는 영역(ROI) 템플릿
+    설정된 비율 영역으로 시작하고, 전체 페이지 OCR 에서 번호 위치를 찾을 때마다 그 위치를 관측값으로 쌓아
+    최근 관측값들의 좌표별 중앙값 영역을 사용함. 등록증이 아닌 페이지 몇 장에서 번호가 엉뚱한 위치에 나와도
+    영역이 끌려가지 않고, 오래된 관측값이 빠지면서 영역이 다시 좁아질 수 있음
+    학습한 관측값은 파일에 저장하여 다음 run 에서도 사용
+
+    Attributes
+    ----------
+    default_region : tuple[float, float, float, float]
+        학습 전 사용할 (left, top, right, bottom) 페이지 대비 비율 영역
+    margin : float
+        학습한 번호 영역에 상하좌우로 더할 여백 (페이지 대비 비율)
+    template_file : str
+        학습한 관측값을 저장할 json 파일 경로, None 이면 run 동안만 유지
+    max_samples : int
+        영역 계산에 사용할 최근 관측값 수
+    boxes : list[tuple[float, float, float, float]]
+        최근 관측한 번호 영역 (여백 없는 페이지 대비 비율), 오래된 순
+    samples : int
+        지금까지 학습에 사용된 페이지 수
+    """
+
+    def __init__(self, default_region: tuple = (0.0, 0.0, 1.0, 0.35), margin: float = 0.03,
+                 template_file: str = None, my_logger: Logger = None, max_samples: int = 50):
+        self.default_region = tuple(default_region)
+        self.margin = margin
+        self.template_file = template_file
+        self.logger = my_logger
+        self.max_samples = max_samples
+        self.boxes = []
+        self.samples = 0
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.load()
+
+    @property
+    def learned_region(self):
+        """
+        최근 관측한 번호 영역들의 좌표별 중앙값에 여백을 더한 비율 영역, 학습 전엔 None
+        """
+        with self._lock:
+            boxes = list(self.boxes)
+        if len(boxes) == 0:
+            return None
+        left, top, right, bottom = [statistics.median(values) for values in zip(*boxes)]
+        return (max(left - self.margin, 0.0), max(top - self.margin, 0.0),
+                min(right + self.margin, 1.0), min(bottom + self.margin, 1.0))
+
+    @property
+    def region(self):
+        """
+        현재 OCR 에 사용할 비율 영역 (학습한 영역이 있으면 학습 영역)
+        """
+        learned_region = self.learned_region
+        return learned_region if learned_region is not None else self.default_region
+
+    def load(self):
+        """
+        학습한 관측값 파일을 읽어 적재, 파일이 없거나 깨졌으면 설정된 영역으로 시작
+        """
+        if self.template_file is None or not os.path.isfile(self.template_file):
+            return
+        try:
+            with io.open(self.template_file, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            boxes = [tuple(float(value) for value in box) for box in saved['boxes']]
+            if any(len(box) != 4 for box in boxes):
+                raise ValueError('영역 좌표는 4개여야 합니다')
+            samples = int(saved['samples'])
+        except (OSError, ValueError, KeyError, TypeError) as ex:
+            if self.logger is not None:
+                self.logger.warning("ROI 템플릿 로드 실패, 설정 영역으로 시작: " + self.template_file
+                                    + " -> {}".format(ex))
+            return
+        with self._lock:
+            self.boxes = boxes[-self.max_samples:]
+            self.samples = samples
+
+    def crop(self, content: bytes, quality: int = 90):
+        """
+        페이지 이미지에서 현재 영역만 잘라 인코딩
+
+        Parameters
+        ----------
+        content : bytes
+            인코딩된 페이지 이미지 바이트
+        quality : int
+            JPEG 인코딩 품질
+
+        Returns
+        -------
+        bytes
+            잘라낸 영역의 이미지 바이트, 실패 시 None
+        """
+        return ImageChain.from_bytes(content, self.logger).crop_box(*self.region).to_bytes('JPEG', quality)
+
+    def learn(self, content: bytes, words: list):
+        """
+        전체 페이지 OCR 의 단어 위치에서 번호 영역을 찾아 관측값에 추가 (max_samples 를 넘으면 가장 오래된 값 제거)
+
+        Parameters
+        ----------
+        content : bytes
+            OCR 에 사용한 페이지 이미지 바이트 (좌표 기준 크기를 얻기 위함)
+        words : list[cloud_vision.OcrWord]
+            전체 페이지 OCR 단어 리스트
+
+        Returns
+        -------
+        bool
+            학습 여부 (번호 위치를 찾지 못했으면 False)
+        """
+        box = find_bsn_box(words or [])
+        if box is None:
+            return False
+        with Image.open(BytesIO(content)) as img:
+            width, height = img.size
+        found = (box[0] / width, box[1] / height, box[2] / width, box[3] / height)
+        with self._lock:
+            self.boxes.append(found)
+            del self.boxes[:-self.max_samples]
+            self.samples += 1
+            self._dirty = True
+        return True
+
+    def save(self):
+        """
+        학습한 관측값이 바뀌었을 때만 json 파일로 저장
+
+        Returns
+        -------
+        bool
+            저장 성공 여부
+        """
+        if self.template_file is None:
+            return True
+        with self._lock:
+            if not self._dirty:
+                return True
+            saved = {'boxes': [list(box) for box in self.boxes], 'samples': self.samples}
+            self._dirty = False
+        tmp_file = self.template_file + '.tmp'
+        try:
+            with io.open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(saved, f)
+            os.replace(tmp_file, self.template_file)
+        except OSError as ex:
+            if self.logger is not None:
+                self.logger.error("ROI 템플릿 저장 실패: " + self.template_file + " -> {}".format(ex))
+            return False
+        return True
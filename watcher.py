@@ -0,0 +1,140 @@
+# 표준 라이브러리
+import os
+import time
+import threading
+from logging import Logger
+# 3rd party
+# 내부 패키지
+
+# 감시 대상 확장자
+WATCH_EXTENSIONS = ('.pdf', '.png', '.jpg', '.jpeg')
+
+
+class FolderWatcher:
+    """
+    입력 폴더를 주기적으로 확인하여 새로 들어온 (혹은 내용이 바뀐) 파일을 하나씩 돌려주는 감시 객체
+    스캐너/복사가 끝나지 않은 파일을 읽지 않도록 크기와 수정 시각이 settle_time 동안 변하지 않은 파일만 내보냄
+
+    Attributes
+    ----------
+    watch_path : str
+        감시할 폴더 경로
+    interval : float
+        폴더 확인 주기 (초)
+    settle_time : float
+        파일이 변하지 않고 유지되어야 하는 시간 (초)
+    is_processed : callable
+        이전 run 에서 처리된 파일인지 확인하는 함수 (파일 경로 -> bool), 재시작 시 중복 처리 방지용
+    retry_delay : float
+        retry 로 돌려받은 (처리에 실패한) 파일을 다시 내보내기까지 기다리는 시간 (초)
+    """
+
+    def __init__(self, watch_path: str, my_logger: Logger, interval: float = 2.0, settle_time: float = 1.0,
+                 is_processed=None, retry_delay: float = 60.0):
+        self.watch_path = watch_path
+        self.logger = my_logger
+        self.interval = interval
+        self.settle_time = settle_time
+        self.is_processed = is_processed
+        self.retry_delay = retry_delay
+        # {파일명: (크기, 수정 시각, 해당 상태가 처음 관측된 시각)}
+        self._pending = {}
+        # {파일명: (크기, 수정 시각)} 이미 내보낸 파일
+        self._emitted = {}
+        # {파일명: 다시 내보낼 수 있는 시각} 처리에 실패해 재시도를 기다리는 파일
+        self._retry_at = {}
+        # poll 은 파이프라인 투입 스레드에서, retry 는 결과를 받는 스레드에서 호출됨
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def poll(self):
+        """
+        폴더를 한 번 확인하여 처리할 준비가 된 파일명 리스트 반환
+
+        Returns
+        -------
+        list[str]
+            새로 들어왔고 크기/수정 시각이 안정된 파일명 리스트 (이름순)
+        """
+        with self._lock:
+            return self._poll()
+
+    def _poll(self):
+        now = time.time()
+        ready_list = []
+        current = set()
+        for filename in sorted(os.listdir(self.watch_path)):
+            if not filename.lower().endswith(WATCH_EXTENSIONS):
+                continue
+            target_file = os.path.join(self.watch_path, filename)
+            try:
+                stat = os.stat(target_file)
+            except OSError:
+                continue
+            current.add(filename)
+            state = (stat.st_size, stat.st_mtime)
+            if self._emitted.get(filename) == state or now < self._retry_at.get(filename, 0):
+                continue
+            pending = self._pending.get(filename)
+            if pending is None or pending[:2] != state:
+                self._pending[filename] = state + (now,)
+                continue
+            if now - pending[2] < self.settle_time:
+                continue
+            del self._pending[filename]
+            self._retry_at.pop(filename, None)
+            self._emitted[filename] = state
+            if self.is_processed is not None and self.is_processed(target_file):
+                continue
+            ready_list.append(filename)
+        # 폴더에서 사라진 파일은 상태에서 제거
+        for filename in list(self._pending):
+            if filename not in current:
+                del self._pending[filename]
+        for filename in list(self._emitted):
+            if filename not in current:
+                del self._emitted[filename]
+        for filename in list(self._retry_at):
+            if filename not in current:
+                del self._retry_at[filename]
+        return ready_list
+
+    def retry(self, filename: str):
+        """
+        내보낸 파일의 처리가 실패했을 때 호출. 파일이 바뀌지 않았어도 retry_delay 뒤 다시 내보냄
+        (홈택스 타임아웃, OCR 할당량 초과처럼 일시적인 실패를 서비스 재시작 없이 재처리)
+
+        Parameters
+        ----------
+        filename : str
+            poll/watch 가 내보냈던 파일명
+        """
+        with self._lock:
+            self._emitted.pop(filename, None)
+            self._pending.pop(filename, None)
+            self._retry_at[filename] = time.time() + self.retry_delay
+
+    def watch(self):
+        """
+        stop 이 호출될 때까지 준비된 파일명을 하나씩 돌려주는 generator
+
+        Returns
+        -------
+        generator[str]
+            처리할 파일명
+        """
+        self.logger.info("폴더 감시 시작: " + self.watch_path)
+        while not self._stop_event.is_set():
+            try:
+                ready_list = self.poll()
+            except OSError as ex:
+                self.logger.error("폴더 감시 실패: " + self.watch_path + " -> {}".format(ex))
+                ready_list = []
+            for filename in ready_list:
+                self.logger.info("새 파일 감지: " + filename)
+                yield filename
+            self._stop_event.wait(self.interval)
+        self.logger.info("폴더 감시 종료: " + self.watch_path)
+
+    def stop(self):
+        self._stop_event.set()